@@ -54,6 +54,15 @@ def linters(session):
     session.run('flake8')
 
 
+@nox.session(python='3')
+def tests(session):
+    set_standard_env_vars(session)
+    session.install('-r', 'requirements.txt')
+    session.install('-e', '.')
+    session.run('python', '-m', 'unittest', 'discover', '-s', 'tests',
+                *session.posargs)
+
+
 @nox.session(python='3')
 def venv(session):
     set_standard_env_vars(session)
@@ -62,6 +71,24 @@ def venv(session):
     session.run(*session.posargs)
 
 
+@nox.session(python='3')
+def benchmark(session):
+    set_standard_env_vars(session)
+    session.install('-r', 'requirements.txt')
+    session.install('aiohttp')
+    session.install('-e', '.')
+    session.run('python', 'tools/benchmark.py', *session.posargs)
+
+
+@nox.session(python='3')
+def loadtest(session):
+    set_standard_env_vars(session)
+    session.install('-r', 'requirements.txt')
+    session.install('aiohttp')
+    session.install('-e', '.')
+    session.run('python', 'tools/loadtest.py', *session.posargs)
+
+
 @nox.session(python='3')
 def bindep(session):
     set_standard_env_vars(session)
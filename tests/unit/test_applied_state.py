@@ -0,0 +1,56 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+from zuul_operator import utils
+
+
+KEY = ('apps/v1', 'StatefulSet', 'zuul', 'zuul-executor')
+
+
+def statefulset(generation):
+    return {'metadata': {'namespace': 'zuul', 'name': 'zuul-executor',
+                         'generation': generation}}
+
+
+class TestAppliedStateCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = utils.AppliedStateCache(600)
+        self.cache.set(KEY, 'digest', 2)
+
+    def test_own_change(self):
+        # The event for what we applied keeps the entry
+        self.cache.observe(KEY, 'MODIFIED', statefulset(2))
+        self.assertEqual('digest', self.cache.get(KEY))
+        self.assertFalse(self.cache.is_stale(KEY))
+
+    def test_changed_by_others(self):
+        self.cache.observe(KEY, 'MODIFIED', statefulset(3))
+        self.assertIsNone(self.cache.get(KEY))
+        self.assertTrue(self.cache.is_stale(KEY))
+        # Until we apply it again
+        self.cache.set(KEY, 'digest', 4)
+        self.assertEqual('digest', self.cache.get(KEY))
+        self.assertFalse(self.cache.is_stale(KEY))
+
+    def test_deleted(self):
+        self.cache.observe(KEY, 'DELETED', statefulset(2))
+        self.assertIsNone(self.cache.get(KEY))
+        self.assertFalse(self.cache.is_stale(KEY))
+
+    def test_expired(self):
+        cache = utils.AppliedStateCache(-1)
+        cache.set(KEY, 'digest', 2)
+        self.assertIsNone(cache.get(KEY))
@@ -0,0 +1,72 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import logging
+import unittest
+
+from zuul_operator import dag
+
+
+log = logging.getLogger('zuul_operator.tests')
+
+
+class TestStepGraph(unittest.TestCase):
+    def test_failure_cancels_running_steps(self):
+        events = []
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise Exception("failed")
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                events.append('slow')
+
+        graph = dag.StepGraph(log)
+        graph.add('fail', fail)
+        graph.add('slow', slow)
+        with self.assertRaises(Exception):
+            asyncio.run(graph.run())
+        # The running step has been cancelled by the time the error
+        # is raised.
+        self.assertEqual(['slow'], events)
+
+    def test_checkpoints(self):
+        ran = []
+        saved = {}
+
+        def step(name):
+            async def run():
+                ran.append(name)
+            return run
+
+        async def save(name, digest):
+            saved[name] = digest
+
+        graph = dag.StepGraph(log, {}, save)
+        graph.add('a', step('a'), inputs={'x': 1})
+        graph.add('b', step('b'), requires=['a'], inputs={'y': 1})
+        asyncio.run(graph.run())
+        self.assertEqual(['a', 'b'], ran)
+
+        # Only the step whose inputs changed is run again
+        ran.clear()
+        graph = dag.StepGraph(log, dict(saved), save)
+        graph.add('a', step('a'), inputs={'x': 1})
+        graph.add('b', step('b'), requires=['a'], inputs={'y': 2})
+        asyncio.run(graph.run())
+        self.assertEqual(['b'], ran)
@@ -0,0 +1,50 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+from zuul_operator import utils
+
+
+def entry(manager, operation, fields, subresource=None):
+    ret = {'manager': manager, 'operation': operation,
+           'fieldsType': 'FieldsV1', 'fieldsV1': fields}
+    if subresource:
+        ret['subresource'] = subresource
+    return ret
+
+
+class TestManagedFields(unittest.TestCase):
+    def test_take_over_legacy_fields(self):
+        status = entry('kube-controller-manager', 'Update',
+                       {'f:status': {'f:replicas': {}}}, 'status')
+        managed_fields = [
+            entry('pykube-ng', 'Update',
+                  {'f:spec': {'f:replicas': {}, 'f:old': {}}}),
+            entry('zuul-operator', 'Apply',
+                  {'f:spec': {'f:replicas': {}, 'f:template': {}}}),
+            status,
+        ]
+        self.assertEqual([
+            entry('zuul-operator', 'Apply',
+                  {'f:spec': {'f:replicas': {}, 'f:template': {},
+                              'f:old': {}}}),
+            status,
+        ], utils.migrate_managed_fields(managed_fields))
+
+    def test_nothing_to_do(self):
+        self.assertIsNone(utils.migrate_managed_fields([
+            entry('zuul-operator', 'Apply', {'f:spec': {}}),
+            entry('kubectl-edit', 'Update', {'f:spec': {'f:x': {}}}),
+        ]))
@@ -0,0 +1,73 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import threading
+import time
+import unittest
+from unittest import mock
+
+from zuul_operator import templating
+
+
+class TestHashKwargs(unittest.TestCase):
+    def test_equal_arguments(self):
+        self.assertEqual(
+            templating._hash_kwargs({'a': {'x', 'y'}, 'b': (1, 2)}),
+            templating._hash_kwargs({'b': [1, 2], 'a': {'y', 'x'}}))
+
+    def test_different_arguments(self):
+        self.assertNotEqual(
+            templating._hash_kwargs({'spec': {'count': 1}}),
+            templating._hash_kwargs({'spec': {'count': 2}}))
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            templating._hash_kwargs({'when': datetime.datetime.now()})
+        with self.assertRaises(TypeError):
+            templating._hash_kwargs({'spec': {1: 'one'}})
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def parse(name, **kw):
+            self.calls.append(name)
+            time.sleep(0.1)
+            return [{'kind': 'ConfigMap', 'data': kw}]
+
+        patcher = mock.patch.object(templating, 'parse', parse)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_misses(self):
+        cache = templating.DocumentCache(8)
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.get('t.yaml', x=1)))
+            for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(['t.yaml'], self.calls)
+        self.assertEqual(4, len(results))
+
+    def test_uncached(self):
+        templating.load_documents('secret.yaml', cache=False, password='x')
+        templating.load_documents('secret.yaml', cache=False, password='x')
+        self.assertEqual(['secret.yaml', 'secret.yaml'], self.calls)
+        self.assertEqual([], [key for key in templating.document_cache.entries
+                              if key[0] == 'secret.yaml'])
@@ -0,0 +1,105 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+from zuul_operator import zuul
+
+
+ZUUL_CONF = """
+[keystore]
+password=secret
+
+[zookeeper]
+hosts=zookeeper:2281
+
+[scheduler]
+tenant_config=/etc/zuul/tenant/main.yaml
+
+[database]
+dburi=mysql+pymysql://zuul:secret@db/zuul
+
+[web]
+listen_address=0.0.0.0
+port=9000
+
+[fingergw]
+port=9079
+
+[merger]
+git_user_email=zuul@example.com
+
+[executor]
+private_key_file=/etc/zuul/sshkey/sshkey
+
+[launcher]
+
+[connection "opendev"]
+driver=git
+baseurl=https://opendev.org
+
+[auth "zuul"]
+driver=HS256
+"""
+
+
+class TestConfSections(unittest.TestCase):
+    def test_component_sections(self):
+        # The zuul.conf sections each component reads; a component is
+        # not restarted for changes to the others, so a missing section
+        # leaves it running with stale settings.
+        self.assertEqual({
+            'zuul-scheduler': {'keystore', 'zookeeper', 'scheduler',
+                               'database', 'web', 'connection', 'auth'},
+            'zuul-web': {'keystore', 'zookeeper', 'scheduler', 'database',
+                         'web', 'connection', 'auth'},
+            'zuul-fingergw': {'keystore', 'zookeeper', 'fingergw'},
+            'zuul-executor': {'keystore', 'zookeeper', 'executor',
+                              'merger', 'connection'},
+            'zuul-merger': {'keystore', 'zookeeper', 'merger',
+                            'connection'},
+            'zuul-launcher': {'keystore', 'zookeeper', 'launcher',
+                              'connection'},
+        }, zuul.COMPONENT_CONF_SECTIONS)
+
+    def test_template_sections_covered(self):
+        # Every section written to zuul.conf is read by some component
+        sections = set().union(*zuul.COMPONENT_CONF_SECTIONS.values())
+        for line in ZUUL_CONF.splitlines():
+            if line.startswith('['):
+                section = line.strip('[]').split(' ', 1)[0]
+                self.assertIn(section, sections)
+
+    def changed(self, old, new):
+        old = zuul.conf_shas(old)
+        new = zuul.conf_shas(new)
+        return {component for component in old
+                if old[component] != new[component]}
+
+    def test_web_root(self):
+        conf = ZUUL_CONF.replace('port=9000',
+                                 'port=9000\nroot=https://zuul.example.com/')
+        self.assertEqual({'zuul-scheduler', 'zuul-web'},
+                         self.changed(ZUUL_CONF, conf))
+
+    def test_connection(self):
+        conf = ZUUL_CONF.replace('https://opendev.org',
+                                 'https://review.opendev.org')
+        self.assertEqual({'zuul-scheduler', 'zuul-web', 'zuul-executor',
+                          'zuul-merger', 'zuul-launcher'},
+                         self.changed(ZUUL_CONF, conf))
+
+    def test_unparseable(self):
+        self.assertEqual(set(zuul.COMPONENT_CONF_SECTIONS),
+                         self.changed(ZUUL_CONF, ZUUL_CONF + '\nbroken'))
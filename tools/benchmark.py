@@ -0,0 +1,437 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure the Kubernetes API calls made by the operator's handlers
+
+Each scenario runs a kopf handler (create_fn or update_fn) directly,
+or changes a config secret and waits for the operator's secret watch
+to handle it, against the fake API server in fakek8s.py and records
+the number of requests, the bytes transferred and the wall time.
+The request counts are compared with the budget in api-budget.yaml;
+the run fails if any scenario makes more calls than its budget
+allows.
+
+Run it with::
+
+  python tools/benchmark.py
+  python tools/benchmark.py --update-budget  # after an intended change
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import sys
+import time
+
+import kopf
+import kubernetes.config
+import yaml
+from kopf._cogs.structs import bodies
+from kopf._cogs.structs import patches
+from kopf._cogs.structs import references
+from kopf._core.actions import execution
+from kopf._core.intents import causes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakek8s
+from zuul_operator import operator
+from zuul_operator import templating
+from zuul_operator import utils
+
+log = logging.getLogger("zuul_operator.benchmark")
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'api-budget.yaml')
+
+# Allow this many calls over the budget before failing, so that small
+# differences in timing (an extra retry of a wait, say) do not make
+# the run flaky.
+BUDGET_SLACK = 0.1
+
+NAMESPACE = 'zuul'
+NAME = 'zuul'
+
+ZUUL_RESOURCE = references.Resource(
+    'operator.zuul-ci.org', 'v1alpha2', 'zuuls', kind='Zuul',
+    namespaced=True)
+
+TENANT_CONFIG = """\
+- tenant:
+    name: example
+    source:
+      opendev:
+        config-projects:
+          - zuul/zuul-base-jobs
+"""
+
+NODEPOOL_CONFIG = """\
+labels:
+  - name: pod-fedora
+providers:
+  - name: kube-cluster
+    driver: kubernetes
+    context: fake
+    pools:
+      - name: main
+        labels:
+          - name: pod-fedora
+            type: pod
+            image: docker.io/fedora:28
+  - name: static
+    driver: static
+    pools:
+      - name: main
+        nodes:
+          - name: static-node
+            labels: pod-fedora
+"""
+
+# A representative spec, like the one in deploy/crds.
+SPEC = {
+    'imagePrefix': 'quay.io/zuul-ci',
+    'executor': {
+        'count': 1,
+        'sshkey': {'secretName': 'executor-ssh-key'},
+    },
+    'merger': {'count': 1},
+    'scheduler': {'config': {'secretName': 'zuul-yaml-conf'}},
+    'launcher': {'config': {'secretName': 'nodepool-yaml-conf'}},
+    'connections': {
+        'opendev': {
+            'driver': 'git',
+            'baseurl': 'https://opendev.org',
+        },
+    },
+    'externalConfig': {
+        'kubernetes': {'secretName': 'nodepool-kube-config'},
+    },
+}
+
+
+def user_secrets(namespace=NAMESPACE, tenant_config=TENANT_CONFIG,
+                 nodepool_config=NODEPOOL_CONFIG):
+    return [
+        fakek8s.secret(namespace, 'executor-ssh-key',
+                       {'sshkey': 'not a real key'}),
+        fakek8s.secret(namespace, 'zuul-yaml-conf',
+                       {'main.yaml': tenant_config}),
+        fakek8s.secret(namespace, 'nodepool-yaml-conf',
+                       {'nodepool.yaml': nodepool_config}),
+        fakek8s.secret(namespace, 'nodepool-kube-config',
+                       {'kube.config': 'apiVersion: v1\nkind: Config\n'}),
+    ]
+
+
+def zuul_body(spec, namespace=NAMESPACE, name=NAME):
+    return {
+        'apiVersion': 'operator.zuul-ci.org/v1alpha2',
+        'kind': 'Zuul',
+        'metadata': {'name': name, 'namespace': namespace},
+        'spec': copy.deepcopy(spec),
+    }
+
+
+def set_cause(body, memo, resource=ZUUL_RESOURCE):
+    # kopf.adopt() finds the owner through the cause of the current
+    # handler.
+    execution.cause_var.set(causes.ResourceCause(
+        logger=log, indices={}, memo=memo, resource=resource,
+        patch=patches.Patch(), body=bodies.Body(body)))
+
+
+async def secret_handled(memo, body, timeout=30):
+    # Wait until the operator's secret watch has seen the version of a
+    # secret written to the fake, and anything it started is done.
+    namespace = body['metadata']['namespace']
+    name = body['metadata']['name']
+    version = int(body['metadata']['resourceVersion'])
+    informer = utils.secret_informers.find(namespace)
+    deadline = time.monotonic() + timeout
+    while True:
+        obj = await utils.run_blocking(informer.get, name)
+        if int(obj['metadata']['resourceVersion']) >= version:
+            break
+        if time.monotonic() > deadline:
+            raise Exception(f"Secret {namespace}/{name} was not seen")
+        await asyncio.sleep(0.01)
+    # The listener is called just after the new version is stored.
+    await asyncio.sleep(0.01)
+    while (namespace, name) in memo.secret_updates:
+        await asyncio.shield(memo.secret_updates[(namespace, name)])
+
+
+async def executor_handled(fake, memo, namespace=NAMESPACE, timeout=30):
+    # Wait until the operator's executor watch has seen the executor
+    # StatefulSet as it is in the fake, and its status is written.
+    body = fake.get('apps/v1', 'statefulsets', namespace, 'zuul-executor')
+    informer = operator.executor_informers.find(namespace)
+    if body is None or informer is None:
+        return
+    version = int(body['metadata']['resourceVersion'])
+    deadline = time.monotonic() + timeout
+    while True:
+        obj = (await utils.run_blocking(informer.items)).get('zuul-executor')
+        if obj and int(obj['metadata']['resourceVersion']) >= version:
+            break
+        if time.monotonic() > deadline:
+            raise Exception(f"Executor in {namespace} was not seen")
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+    key = (namespace, NAME)
+    while key in memo.executor_writers:
+        await asyncio.shield(memo.executor_writers[key])
+
+
+def connect(fake):
+    # Point both API clients used by the operator at the fake server
+    os.environ['KUBECONFIG'] = fake.kubeconfig
+    kubernetes.config.load_kube_config(config_file=fake.kubeconfig)
+    utils.configure_api()
+
+
+class Harness:
+    def __init__(self, fake):
+        self.fake = fake
+        self.memo = None
+
+    def clear_caches(self):
+        # As if the operator had just been restarted.
+        utils.applied_state.clear()
+        templating.document_cache.clear()
+        utils.secret_informers.stop()
+        operator.executor_informers.stop()
+
+    def setup_cluster(self, spec=SPEC):
+        self.clear_caches()
+        self.fake.reset()
+        for obj in user_secrets():
+            self.fake.put(obj)
+        return self.fake.put(zuul_body(spec))
+
+    async def start_operator(self):
+        self.memo = kopf.Memo()
+        await operator.startup(memo=self.memo, logger=log)
+
+    async def stop_operator(self):
+        await operator.cleanup(memo=self.memo, logger=log)
+
+    async def create(self, spec=SPEC):
+        body = self.fake.get('operator.zuul-ci.org/v1alpha2', 'zuuls',
+                             NAMESPACE, NAME)
+        set_cause(body, self.memo)
+        await operator.create_fn(
+            spec=copy.deepcopy(spec), name=NAME, namespace=NAMESPACE,
+            logger=log, memo=self.memo,
+            status=copy.deepcopy(body.get('status', {})))
+        await executor_handled(self.fake, self.memo)
+
+    async def update(self, old, new):
+        body = self.fake.put(zuul_body(new))
+        set_cause(body, self.memo)
+        await operator.update_fn(
+            name=NAME, namespace=NAMESPACE, logger=log,
+            old={'spec': copy.deepcopy(old)},
+            new={'spec': copy.deepcopy(new)}, memo=self.memo)
+        await executor_handled(self.fake, self.memo)
+
+    async def update_secret(self, name, data):
+        body = self.fake.put(fakek8s.secret(NAMESPACE, name, data))
+        await secret_handled(self.memo, body)
+
+
+def changed_spec(**changes):
+    spec = copy.deepcopy(SPEC)
+    for path, value in changes.items():
+        d = spec
+        keys = path.split('__')
+        for key in keys[:-1]:
+            d = d.setdefault(key, {})
+        d[keys[-1]] = value
+    return spec
+
+
+# Each scenario is (name, setup, measured) where both are coroutine
+# functions taking the harness.  Only the API calls made by the
+# measured part count.
+
+async def _installed(h):
+    h.setup_cluster()
+    await h.start_operator()
+    await h.create()
+
+
+async def _create(h):
+    await h.create()
+
+
+async def _create_after_restart(h):
+    h.clear_caches()
+    await h.stop_operator()
+    await h.start_operator()
+    await h.create()
+
+
+async def _fresh(h):
+    h.setup_cluster()
+    await h.start_operator()
+
+
+def _update(**changes):
+    async def run(h):
+        await h.update(SPEC, changed_spec(**changes))
+    return run
+
+
+def _secret(name, data):
+    async def run(h):
+        await h.update_secret(name, data)
+    return run
+
+
+SCENARIOS = [
+    ('create', _fresh, _create),
+    ('create-again', _installed, _create),
+    ('create-after-restart', _installed, _create_after_restart),
+    ('update-executor-count', _installed, _update(executor__count=3)),
+    ('update-image-version', _installed,
+     _update(zuulImageVersion='10.0.0')),
+    ('update-connection', _installed,
+     _update(connections={'opendev': {
+         'driver': 'git', 'baseurl': 'https://opendev.org/'}})),
+    ('update-nodepool-image', _installed,
+     _update(nodepoolImageVersion='10.0.0')),
+    ('secret-tenant-config', _installed,
+     _secret('zuul-yaml-conf',
+             {'main.yaml': TENANT_CONFIG + '# changed\n'})),
+    ('secret-nodepool-config', _installed,
+     _secret('nodepool-yaml-conf',
+             {'nodepool.yaml': NODEPOOL_CONFIG.replace(
+                 'docker.io/fedora:28', 'docker.io/fedora:40')})),
+]
+
+
+async def run_scenario(fake, name, setup, measured):
+    h = Harness(fake)
+    await setup(h)
+    if h.memo is None:
+        await h.start_operator()
+    fake.stats.reset()
+    start = time.monotonic()
+    await measured(h)
+    elapsed = time.monotonic() - start
+    stats = fake.stats.snapshot()
+    stats['seconds'] = round(elapsed, 3)
+    stats['execs'] = stats['by_verb'].get('exec', 0)
+    await h.stop_operator()
+    return stats
+
+
+def check_budget(results, budget):
+    failures = []
+    for name, stats in results.items():
+        allowed = budget.get(name)
+        if allowed is None:
+            failures.append(f"{name}: no budget (run with --update-budget)")
+            continue
+        limit = int(allowed * (1 + BUDGET_SLACK))
+        if stats['calls'] > limit:
+            failures.append(
+                f"{name}: {stats['calls']} API calls exceeds the budget "
+                f"of {allowed} (+{int(BUDGET_SLACK * 100)}%)")
+    return failures
+
+
+def write_budget(path, results):
+    with open(path, 'w') as f:
+        f.write("# The maximum number of Kubernetes API calls (excluding\n"
+                "# watches) made by each scenario in tools/benchmark.py.\n"
+                "# Regenerate with: python tools/benchmark.py "
+                "--update-budget\n")
+        yaml.safe_dump({name: stats['calls']
+                        for name, stats in results.items()},
+                       f, default_flow_style=False, sort_keys=False)
+
+
+def report(results, verbose):
+    print(f"{'scenario':<28}{'calls':>7}{'watches':>9}{'execs':>7}"
+          f"{'KiB sent':>10}{'KiB recv':>10}{'seconds':>9}")
+    for name, stats in results.items():
+        print(f"{name:<28}{stats['calls']:>7}{stats['watches']:>9}"
+              f"{stats['execs']:>7}{stats['bytes_in'] / 1024:>10.1f}"
+              f"{stats['bytes_out'] / 1024:>10.1f}{stats['seconds']:>9.2f}")
+        if verbose:
+            for key, count in stats['by_resource'].items():
+                print(f"    {count:>5}  {key}")
+
+
+async def run(args):
+    fake = fakek8s.FakeKubernetes().start()
+    try:
+        connect(fake)
+        results = {}
+        for name, setup, measured in SCENARIOS:
+            if args.scenario and name not in args.scenario:
+                continue
+            results[name] = await run_scenario(fake, name, setup, measured)
+    finally:
+        utils.secret_informers.stop()
+        operator.executor_informers.stop()
+        fake.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', default=BUDGET_FILE,
+                        help="The API call budget file")
+    parser.add_argument('--update-budget', action='store_true',
+                        help="Write the measured calls as the new budget")
+    parser.add_argument('--scenario', action='append',
+                        help="Only run this scenario (may be repeated)")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the full results as JSON")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="Show the calls by verb and resource")
+    parser.add_argument('-d', '--debug', action='store_true',
+                        help="Show the operator's log")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.CRITICAL)
+    results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results, args.verbose)
+
+    if args.update_budget:
+        write_budget(args.budget, results)
+        return 0
+    with open(args.budget) as f:
+        budget = yaml.safe_load(f) or {}
+    failures = check_budget(results, budget)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
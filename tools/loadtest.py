@@ -0,0 +1,364 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Load test the operator with many Zuul resources
+
+This creates a number of Zuul resources (one per namespace, each with
+a number of nodepool providers and connections) against the fake API
+server in fakek8s.py, runs the create handler for all of them at once,
+and then changes their tenant and nodepool config secrets at random
+while unrelated secrets change too.
+
+It reports the reconcile throughput, the handler latency, the time to
+rebuild the secret index, the operator's memory use (which includes
+the fake API server, since it runs in the same process) and how late
+the event loop ran timers.
+
+Run it with::
+
+  python tools/loadtest.py --zuuls 200 --providers 10 --connections 20
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+
+import kopf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+import fakek8s
+from zuul_operator import operator
+from zuul_operator import utils
+
+log = logging.getLogger("zuul_operator.loadtest")
+
+# How often the event loop lag is sampled.
+LAG_INTERVAL = 0.05
+
+
+def nodepool_config(providers):
+    config = {
+        'labels': [{'name': 'small'}],
+        'providers': [{
+            'name': f'provider-{i}',
+            'driver': 'static',
+            'pools': [{
+                'name': 'main',
+                'nodes': [{'name': f'node-{i}', 'labels': 'small'}],
+            }],
+        } for i in range(providers)],
+    }
+    return json.dumps(config, indent=2)
+
+
+def spec(connections):
+    spec = copy.deepcopy(benchmark.SPEC)
+    spec['connections'] = {
+        f'git-{i}': {
+            'driver': 'git',
+            'baseurl': f'https://git{i}.example.com',
+        } for i in range(connections)
+    }
+    return spec
+
+
+def percentile(values, pct):
+    # Nearest rank
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def rss():
+    # The current resident set size in bytes
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak instead of current, but better than nothing
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Monitor:
+    """Sample event loop lag and memory use in the background"""
+
+    def __init__(self):
+        self.lag = []
+        self.peak_rss = 0
+        self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self.peak_rss = rss()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lag.append(loop.time() - start - LAG_INTERVAL)
+            self.peak_rss = max(self.peak_rss, rss())
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self.task.cancel()
+
+    def result(self):
+        return {
+            'lag_p50': round(percentile(self.lag, 50), 4),
+            'lag_p99': round(percentile(self.lag, 99), 4),
+            'lag_max': round(max(self.lag, default=0), 4),
+            'peak_rss_mib': round(self.peak_rss / 2**20, 1),
+        }
+
+
+class Phase:
+    def __init__(self, name, fake):
+        self.name = name
+        self.fake = fake
+        self.latencies = []
+        self.errors = 0
+        self.ignored = 0
+        self.steps = {}
+        self.monitor = Monitor()
+
+    async def timed(self, coro):
+        start = time.monotonic()
+        try:
+            ret = await coro
+        except Exception:
+            log.exception(f"Error in {self.name}")
+            self.errors += 1
+            return None
+        self.latencies.append(time.monotonic() - start)
+        return ret
+
+    async def run(self, coros):
+        self.fake.stats.reset()
+        self.monitor.start()
+        start = time.monotonic()
+        results = await asyncio.gather(*coros)
+        self.elapsed = time.monotonic() - start
+        self.monitor.stop()
+        self.calls = self.fake.stats.snapshot()['calls']
+        return results
+
+    def result(self):
+        ret = {
+            'handlers': len(self.latencies),
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+            'throughput': round(len(self.latencies) / self.elapsed, 2),
+            'p50': round(percentile(self.latencies, 50), 3),
+            'p99': round(percentile(self.latencies, 99), 3),
+            'api_calls': self.calls,
+        }
+        if self.ignored:
+            ret['ignored'] = self.ignored
+        if self.steps:
+            ret['steps'] = {
+                name: {'p50': round(percentile(d, 50), 3),
+                       'p99': round(percentile(d, 99), 3)}
+                for name, d in sorted(self.steps.items())}
+        ret.update(self.monitor.result())
+        return ret
+
+
+class LoadTest:
+    def __init__(self, fake, args):
+        self.fake = fake
+        self.args = args
+        self.spec = spec(args.connections)
+        self.namespaces = [f'zuul-{i}' for i in range(args.zuuls)]
+        self.random = random.Random(args.seed)
+        self.memo = None
+
+    def populate(self):
+        self.fake.reset()
+        config = nodepool_config(self.args.providers)
+        for namespace in self.namespaces:
+            for obj in benchmark.user_secrets(
+                    namespace, nodepool_config=config):
+                self.fake.put(obj)
+            self.fake.put(benchmark.zuul_body(self.spec, namespace))
+            for i in range(self.args.other_secrets):
+                self.fake.put(fakek8s.secret(
+                    namespace, f'other-{i}', {'key': 'value'}))
+
+    async def create(self, namespace):
+        body = self.fake.get('operator.zuul-ci.org/v1alpha2', 'zuuls',
+                             namespace, benchmark.NAME)
+        benchmark.set_cause(body, self.memo)
+        return await operator.create_fn(
+            spec=copy.deepcopy(self.spec), name=benchmark.NAME,
+            namespace=namespace, logger=log, memo=self.memo,
+            status=copy.deepcopy(body.get('status', {})))
+
+    async def change_secret(self, phase, namespace, name, data):
+        # The operator's secret watch sees every change; only those to
+        # config secrets are handled (and timed).
+        body = self.fake.put(fakek8s.secret(namespace, name, data))
+        if not operator.when_update_secret(
+                name=name, namespace=namespace, memo=self.memo,
+                logger=log):
+            phase.ignored += 1
+            return
+        await phase.timed(benchmark.secret_handled(self.memo, body))
+
+    def churn(self, phase):
+        # A random mix of changes to the tenant config, the nodepool
+        # config and secrets the operator does not care about.
+        for i in range(self.args.churn):
+            namespace = self.random.choice(self.namespaces)
+            choice = self.random.random()
+            if choice < 0.4:
+                yield self.change_secret(
+                    phase, namespace, 'zuul-yaml-conf',
+                    {'main.yaml': benchmark.TENANT_CONFIG + f'# {i}\n'})
+            elif choice < 0.6:
+                config = nodepool_config(self.random.randint(
+                    max(self.args.providers - 1, 1),
+                    self.args.providers + 1))
+                yield self.change_secret(
+                    phase, namespace, 'nodepool-yaml-conf',
+                    {'nodepool.yaml': config})
+            elif self.args.other_secrets:
+                n = self.random.randrange(self.args.other_secrets)
+                yield self.change_secret(
+                    phase, namespace, f'other-{n}', {'key': str(i)})
+
+    async def run(self):
+        results = {
+            'zuuls': self.args.zuuls,
+            'providers': self.args.providers,
+            'connections': self.args.connections,
+        }
+        self.populate()
+        self.memo = kopf.Memo()
+        await operator.startup(memo=self.memo, logger=log)
+
+        phase = Phase('create', self.fake)
+        summaries = await phase.run(
+            [phase.timed(self.create(ns)) for ns in self.namespaces])
+        for summary in summaries:
+            if summary:
+                for name, step in summary['install']['steps'].items():
+                    phase.steps.setdefault(name, []).append(
+                        step['duration'])
+        results['create'] = phase.result()
+
+        # The index is rebuilt at startup and periodically after that.
+        phase = Phase('memoize_secrets', self.fake)
+        await phase.run([
+            phase.timed(operator.memoize_secrets(self.memo, log))
+            for i in range(self.args.memoize_runs)])
+        results['memoize_secrets'] = phase.result()
+
+        phase = Phase('secret churn', self.fake)
+        await phase.run(list(self.churn(phase)))
+        results['update_secret'] = phase.result()
+
+        await operator.cleanup(memo=self.memo, logger=log)
+        results['rss_mib'] = round(rss() / 2**20, 1)
+        return results
+
+
+def report(results):
+    print(f"{results['zuuls']} Zuuls with {results['providers']} providers "
+          f"and {results['connections']} connections each; "
+          f"RSS {results['rss_mib']} MiB")
+    print(f"{'phase':<18}{'handlers':>9}{'errors':>7}{'per sec':>9}"
+          f"{'p50 s':>8}{'p99 s':>8}{'calls':>8}{'lag p99':>9}"
+          f"{'lag max':>9}{'peak MiB':>10}")
+    for name in ('create', 'memoize_secrets', 'update_secret'):
+        r = results[name]
+        print(f"{name:<18}{r['handlers']:>9}{r['errors']:>7}"
+              f"{r['throughput']:>9.1f}{r['p50']:>8.3f}{r['p99']:>8.3f}"
+              f"{r['api_calls']:>8}{r['lag_p99']:>9.3f}"
+              f"{r['lag_max']:>9.3f}{r['peak_rss_mib']:>10.1f}")
+    if results['update_secret'].get('ignored'):
+        print(f"{results['update_secret']['ignored']} secret changes "
+              f"were filtered out")
+    print("create steps (p50/p99 s):")
+    for name, step in results['create'].get('steps', {}).items():
+        print(f"  {name:<26}{step['p50']:>8.3f}{step['p99']:>8.3f}")
+
+
+async def run(args):
+    fake = fakek8s.FakeKubernetes().start()
+    try:
+        benchmark.connect(fake)
+        utils.configure_concurrency(
+            max_reconciles=args.max_concurrent_reconciles)
+        return await LoadTest(fake, args).run()
+    finally:
+        utils.secret_informers.stop()
+        operator.executor_informers.stop()
+        fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zuuls', type=int, default=100,
+                        help="The number of Zuul resources")
+    parser.add_argument('--providers', type=int, default=5,
+                        help="The number of nodepool providers per Zuul")
+    parser.add_argument('--connections', type=int, default=10,
+                        help="The number of connections per Zuul")
+    parser.add_argument('--churn', type=int, default=500,
+                        help="The number of secret changes")
+    parser.add_argument('--other-secrets', type=int, default=10,
+                        help="Unrelated secrets per namespace")
+    parser.add_argument('--memoize-runs', type=int, default=5,
+                        help="How many times to rebuild the secret index")
+    parser.add_argument('--max-concurrent-reconciles', type=int,
+                        default=utils.MAX_CONCURRENT_RECONCILES,
+                        help="As for the operator")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the random secret changes")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the results as JSON")
+    parser.add_argument('-d', '--debug', action='store_true',
+                        help="Show the operator's log")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.CRITICAL)
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+    errors = sum(results[name]['errors'] for name in
+                 ('create', 'memoize_secrets', 'update_secret'))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,15 +12,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import time
-
 import pykube
 
 from . import objects
 from . import utils
+from . import waiter
 
 
 class CertManager:
+    # How long to wait for the webhook to start before retrying.
+    wait_timeout = 600
+
     def __init__(self, api, namespace, logger):
         self.api = api
         self.namespace = namespace
@@ -36,25 +38,24 @@ class CertManager:
             return False
         return True
 
-    def install(self):
-        utils.apply_file(self.api, 'cert-manager.yaml', _adopt=False)
-
-    def create_ca(self):
-        utils.apply_file(self.api, 'cert-authority.yaml',
-                         namespace=self.namespace)
-
-    def wait_for_webhook(self):
-        while True:
-            count = 0
-            for obj in objects.Pod.objects(self.api).filter(
-                    namespace='cert-manager',
-                    selector={'app.kubernetes.io/component': 'webhook',
-                              'app.kubernetes.io/instance': 'cert-manager'}):
-                if obj.obj['status']['phase'] == 'Running':
-                    count += 1
-            if count > 0:
-                self.log.info("Cert-manager is running")
-                return
-            else:
-                self.log.info("Waiting for Cert-manager")
-                time.sleep(10)
+    async def install(self):
+        await utils.run_blocking(
+            utils.apply_file, self.api, 'cert-manager.yaml', _adopt=False)
+
+    async def create_ca(self):
+        await utils.run_blocking(
+            utils.apply_file, self.api, 'cert-authority.yaml',
+            namespace=self.namespace)
+
+    async def wait_for_webhook(self):
+        await utils.run_waiting(
+            waiter.wait_for,
+            self.api, objects.Pod, 'Cert-manager', self.log,
+            condition=lambda pods: waiter.count_running(pods) > 0,
+            progress=lambda pods: f"{waiter.count_running(pods)} running",
+            timeout=self.wait_timeout,
+            metric_name='cert-manager',
+            namespace='cert-manager',
+            selector={'app.kubernetes.io/component': 'webhook',
+                      'app.kubernetes.io/instance': 'cert-manager'})
+        self.log.info("Cert-manager is running")
@@ -13,10 +13,37 @@
 # under the License.
 
 import argparse
+import os
+import socket
 
 import kopf
 
 from zuul_operator import ZuulOperator
+from zuul_operator import metrics
+from zuul_operator import sharding
+from zuul_operator import tracing
+from zuul_operator import utils
+
+SERVICE_ACCOUNT_NAMESPACE = \
+    '/var/run/secrets/kubernetes.io/serviceaccount/namespace'
+
+
+def default_namespace():
+    # The namespace we are running in, if any
+    if os.environ.get('POD_NAMESPACE'):
+        return os.environ['POD_NAMESPACE']
+    try:
+        with open(SERVICE_ACCOUNT_NAMESPACE) as f:
+            return f.read().strip()
+    except OSError:
+        return 'default'
+
+
+def label(text):
+    key, sep, value = text.partition('=')
+    if not (key and sep):
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE: {text}")
+    return key, value
 
 
 class ZuulOperatorCommand:
@@ -35,8 +62,67 @@ class ZuulOperatorCommand:
                             version=self._get_version())
         parser.add_argument('-d', dest='debug', action='store_true',
                             help='enable debug log')
+        parser.add_argument('--api-pool-size', dest='api_pool_size',
+                            type=int, default=utils.API_POOL_SIZE,
+                            help='maximum number of pooled connections '
+                            'to the Kubernetes API server')
+        parser.add_argument('--max-concurrent-reconciles',
+                            dest='max_concurrent_reconciles', type=int,
+                            default=utils.MAX_CONCURRENT_RECONCILES,
+                            help='maximum number of Zuul resources to '
+                            'reconcile at once')
+        parser.add_argument('--blocking-workers', dest='blocking_workers',
+                            type=int, default=None,
+                            help='number of threads for Kubernetes API '
+                            'calls (default: %d per concurrent reconcile, '
+                            'at least %d)' % (
+                                utils.BLOCKING_WORKERS_PER_RECONCILE,
+                                utils.MIN_BLOCKING_WORKERS))
+        parser.add_argument('--metrics-port', dest='metrics_port',
+                            type=int, default=None,
+                            help='serve Prometheus metrics on this port '
+                            '(disabled by default)')
+        parser.add_argument('--trace-file', dest='trace_file',
+                            help='append trace spans to this file in '
+                            'the OTLP/JSON format')
+        parser.add_argument('--trace-endpoint', dest='trace_endpoint',
+                            help='send trace spans to this OTLP/HTTP '
+                            'collector (for example '
+                            'http://localhost:4318)')
+        parser.add_argument('--shard-group', dest='shard_group',
+                            help='share the Zuul resources with the other '
+                            'replicas in this shard group, each handling '
+                            'a subset of the namespaces')
+        parser.add_argument('--shard-namespace', dest='shard_namespace',
+                            default=None,
+                            help='the namespace for the shard group '
+                            'Leases (default: our own)')
+        parser.add_argument('--shard-identity', dest='shard_identity',
+                            default=os.environ.get('POD_NAME',
+                                                   socket.gethostname()),
+                            help='the unique name of this replica in the '
+                            'shard group (default: the pod name)')
+        parser.add_argument('--secret-label', dest='secret_label',
+                            type=label, action='append', default=[],
+                            metavar='KEY=VALUE',
+                            help='only watch the Secrets with this label '
+                            '(may be repeated); the config Secrets of '
+                            'each Zuul must have it')
         args = parser.parse_args()
 
+        utils.configure_api(pool_size=args.api_pool_size)
+        utils.configure_concurrency(
+            max_reconciles=args.max_concurrent_reconciles,
+            blocking_workers=args.blocking_workers)
+        if args.metrics_port:
+            metrics.start(args.metrics_port)
+        tracing.configure(path=args.trace_file,
+                          endpoint=args.trace_endpoint)
+        utils.configure_secret_watch(dict(args.secret_label))
+        sharding.configure(args.shard_group,
+                           args.shard_namespace or default_namespace(),
+                           args.shard_identity)
+
         # Use kopf's loggers since they carry object data
         kopf.configure(debug=False, verbose=args.debug,
                        quiet=False,
@@ -0,0 +1,198 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import hashlib
+import json
+import time
+
+from . import tracing
+
+
+def checkpoint_digest(name, inputs):
+    # Inputs must be plain JSON types (a TypeError otherwise), so that
+    # equal inputs always produce the same digest.
+    text = json.dumps([name, inputs], sort_keys=True)
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+class Step:
+    def __init__(self, name, func, requires, inputs):
+        self.name = name
+        self.func = func
+        self.requires = list(requires)
+        self.digest = None
+        if inputs is not None:
+            self.digest = checkpoint_digest(name, inputs)
+        self.skipped = False
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class StepGraph:
+    """Run a set of named async steps with declared dependencies
+
+    Each step starts as soon as all of the steps it requires have
+    finished, so independent steps overlap as much as possible.  If a
+    step fails, the steps still running are cancelled and the error is
+    raised.
+
+    After a successful run, the per-step timings and the critical path
+    (the chain of steps which determined the total run time) are
+    available from summary().
+
+    Steps added with inputs (any JSON-serializable value describing
+    everything the outcome of the step depends on) are checkpointed:
+    when such a step finishes, save_checkpoint is awaited with its name
+    and a digest of its inputs.  On a later run given those
+    checkpoints, the step is skipped if its digest is unchanged and
+    none of the steps it requires were run; a step without inputs is
+    always run, and so are the steps after it.
+    """
+
+    def __init__(self, log, checkpoints=None, save_checkpoint=None):
+        self.log = log
+        self.checkpoints = dict(checkpoints or {})
+        self.save_checkpoint = save_checkpoint
+        self.steps = {}
+        self.start = None
+        self.end = None
+
+    def add(self, name, func, requires=(), inputs=None):
+        if name in self.steps:
+            raise Exception(f"Duplicate step {name}")
+        self.steps[name] = Step(name, func, requires, inputs)
+
+    def _validate(self):
+        for step in self.steps.values():
+            for req in step.requires:
+                if req not in self.steps:
+                    raise Exception(
+                        f"Step {step.name} requires unknown step {req}")
+        # Make sure there is no cycle (which would never finish).
+        done = set()
+        remaining = set(self.steps)
+        while remaining:
+            ready = [n for n in remaining
+                     if set(self.steps[n].requires) <= done]
+            if not ready:
+                raise Exception(
+                    f"Dependency cycle among steps {sorted(remaining)}")
+            done.update(ready)
+            remaining.difference_update(ready)
+
+    def _completed(self, step):
+        # Whether the step can be skipped
+        if step.digest is None:
+            return False
+        if self.checkpoints.get(step.name) != step.digest:
+            return False
+        return all(self.steps[r].skipped for r in step.requires)
+
+    async def _run_step(self, step):
+        step.start = time.monotonic()
+        self.log.debug(f"Starting step {step.name}")
+        if (step.digest and self.save_checkpoint and
+            self.checkpoints.get(step.name)):
+            # The checkpoint no longer describes what is installed
+            await self.save_checkpoint(step.name, None)
+        with tracing.span(step.name):
+            await step.func()
+        if step.digest and self.save_checkpoint:
+            await self.save_checkpoint(step.name, step.digest)
+        step.end = time.monotonic()
+        self.log.debug(f"Finished step {step.name} in "
+                       f"{step.duration:.1f}s")
+
+    async def run(self):
+        self._validate()
+        self.start = time.monotonic()
+        done = set()
+        running = {}
+        try:
+            while len(done) < len(self.steps):
+                ready = True
+                while ready:
+                    ready = False
+                    for step in self.steps.values():
+                        if (step.name in done or
+                            step.name in running.values() or
+                            not set(step.requires) <= done):
+                            continue
+                        if self._completed(step):
+                            self.log.info(
+                                f"Skipping step {step.name}: completed "
+                                f"by an earlier run")
+                            step.skipped = True
+                            step.start = step.end = time.monotonic()
+                            done.add(step.name)
+                            # Its dependents may now be ready
+                            ready = True
+                        else:
+                            task = asyncio.ensure_future(
+                                self._run_step(step))
+                            running[task] = step.name
+                if not running:
+                    continue
+                finished, _ = await asyncio.wait(
+                    running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    name = running.pop(task)
+                    # Raises if the step failed.
+                    task.result()
+                    done.add(name)
+        finally:
+            for task in running:
+                task.cancel()
+            # Let the cancelled steps unwind before the error reaches
+            # our caller, so none of them is still running in the
+            # background when it retries.
+            await asyncio.gather(*running, return_exceptions=True)
+        self.end = time.monotonic()
+        self.log.info(self.describe())
+        return self.summary()
+
+    def critical_path(self):
+        path = []
+        step = max(self.steps.values(), key=lambda s: s.end, default=None)
+        while step:
+            path.append(step)
+            step = max((self.steps[r] for r in step.requires),
+                       key=lambda s: s.end, default=None)
+        return list(reversed(path))
+
+    def summary(self):
+        return {
+            'duration': round(self.end - self.start, 3),
+            'steps': {
+                step.name: {
+                    'start': round(step.start - self.start, 3),
+                    'duration': round(step.duration, 3),
+                } for step in self.steps.values()
+            },
+            'criticalPath': [step.name for step in self.critical_path()],
+            'skipped': sorted(step.name for step in self.steps.values()
+                              if step.skipped),
+        }
+
+    def describe(self):
+        path = ' -> '.join(f"{step.name} ({step.duration:.1f}s)"
+                           for step in self.critical_path())
+        skipped = len([s for s in self.steps.values() if s.skipped])
+        return (f"Completed {len(self.steps)} steps ({skipped} skipped) in "
+                f"{self.end - self.start:.1f}s; critical path: {path}")
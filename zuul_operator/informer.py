@@ -0,0 +1,291 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+import threading
+import time
+
+import pykube.exceptions
+import requests
+
+from . import waiter
+
+log = logging.getLogger("zuul_operator.informer")
+
+# How long a reader waits for the initial list of a new informer
+# before giving up and reading from the API server directly.
+SYNC_TIMEOUT = 30
+
+
+def _newer(a, b):
+    # Whether resourceVersion a is newer than b.  These are opaque
+    # strings, but in practice they are integers, and when they are
+    # not we can only assume the most recent one we saw is newest.
+    try:
+        return int(a) > int(b)
+    except (TypeError, ValueError):
+        return True
+
+
+class Informer:
+    """Keep a local copy of the objects of one kind in a namespace
+
+    The objects are listed once and then kept up to date by a watch
+    running in a background thread, so that reads are served from
+    memory rather than with a request to the API server each.
+
+    Objects written by the operator itself should be passed to
+    observe() with the response from the API server; the copy is
+    used immediately (so a reader always sees its own writes) and is
+    not replaced by any older event still in flight on the watch.
+
+    Listeners added with add_listener() are called from the watch
+    thread with the event type ('ADDED', 'MODIFIED' or 'DELETED'), the
+    object (as a dict) and the previous version of it (or None) for
+    every change after the initial list.
+
+    With initial_events, the listeners are also called with 'ADDED'
+    for each object in the initial list.
+
+    With a selector (a dict of labels), only the objects with those
+    labels are kept; others are still read from the API server by
+    get(), but every time.
+    """
+
+    def __init__(self, get_api, kind, namespace, selector=None,
+                 initial_events=False):
+        self.get_api = get_api
+        self.kind = kind
+        self.namespace = namespace
+        self.selector = selector
+        self.initial_events = initial_events
+        self.description = f"{kind.kind} objects in {namespace}"
+        self.objs = {}
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.stopped = threading.Event()
+        self.listeners = []
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self._run, daemon=True,
+            name=f"informer-{self.kind.kind}-{self.namespace}")
+        self.thread.start()
+
+    def stop(self):
+        # The watch thread exits at the latest when the current watch
+        # request times out.
+        self.stopped.set()
+
+    def add_listener(self, func):
+        self.listeners.append(func)
+
+    def _query(self):
+        return self.kind.objects(self.get_api()).filter(
+            namespace=self.namespace, selector=self.selector)
+
+    def _matches(self, obj):
+        labels = obj['metadata'].get('labels') or {}
+        return all(labels.get(k) == v
+                   for k, v in (self.selector or {}).items())
+
+    def _notify(self, event_type, obj, old=None):
+        for listener in list(self.listeners):
+            try:
+                listener(event_type, obj, old)
+            except Exception:
+                log.exception(f"Error in listener for {self.description}")
+
+    def _replace(self, objs):
+        with self.lock:
+            old = self.objs
+            self.objs = {}
+            for name, obj in objs.items():
+                current = old.get(name)
+                if current and _newer(
+                        current['metadata']['resourceVersion'],
+                        obj['metadata']['resourceVersion']):
+                    obj = current
+                self.objs[name] = obj
+        if self.synced.is_set() or self.initial_events:
+            # A relist after the watch expired (or the first list,
+            # if asked); let the listeners know about anything which
+            # changed in the gap.
+            for name, obj in self.objs.items():
+                current = old.get(name)
+                if current is None:
+                    self._notify('ADDED', obj)
+                elif (current['metadata']['resourceVersion'] !=
+                      obj['metadata']['resourceVersion']):
+                    self._notify('MODIFIED', obj, current)
+            for name in set(old) - set(self.objs):
+                self._notify('DELETED', old[name])
+
+    def _event(self, event_type, obj):
+        name = obj['metadata']['name']
+        with self.lock:
+            current = self.objs.get(name)
+            if event_type == 'DELETED':
+                self.objs.pop(name, None)
+            elif current and not _newer(
+                    obj['metadata']['resourceVersion'],
+                    current['metadata']['resourceVersion']):
+                # We already have this (or a newer) version.
+                return
+            else:
+                self.objs[name] = obj
+        self._notify(event_type, obj, current)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                query = self._query()
+                objs, resource_version = waiter._list(query)
+                self._replace(objs)
+                self.synced.set()
+                while not self.stopped.is_set():
+                    for event in waiter._watch(query, resource_version,
+                                               waiter.WATCH_TIMEOUT):
+                        obj = event['object']
+                        if event['type'] == 'ERROR':
+                            raise waiter._Expired(obj.get('message'))
+                        resource_version = \
+                            obj['metadata']['resourceVersion']
+                        if event['type'] == 'BOOKMARK':
+                            continue
+                        self._event(event['type'], obj)
+                        if self.stopped.is_set():
+                            break
+            except waiter._Expired as e:
+                log.debug(f"Watch for {self.description} expired: {e}")
+            except pykube.exceptions.HTTPError as e:
+                if e.code != 410:
+                    log.warning(f"Error watching {self.description}: {e}")
+                    time.sleep(waiter.ERROR_DELAY)
+            except requests.exceptions.RequestException as e:
+                log.warning(f"Error watching {self.description}: {e}")
+                time.sleep(waiter.ERROR_DELAY)
+            except Exception:
+                log.exception(f"Error watching {self.description}")
+                time.sleep(waiter.ERROR_DELAY)
+
+    def get(self, name):
+        """Return the named object (as a dict)
+
+        Raises ObjectDoesNotExist if there is no such object.  An
+        object which is not (yet) in the cache is read from the API
+        server, so an object created moments ago is still found.
+        """
+        if self.synced.wait(SYNC_TIMEOUT):
+            with self.lock:
+                obj = self.objs.get(name)
+            if obj is not None:
+                return obj
+        obj = self.kind.objects(self.get_api()).filter(
+            namespace=self.namespace).get(name=name).obj
+        self.observe(obj)
+        return obj
+
+    def cached(self, name):
+        """Return the named object if it is in the cache, or None
+
+        Unlike get(), this never waits or reads from the API server.
+        """
+        with self.lock:
+            return self.objs.get(name)
+
+    def items(self):
+        """Return a snapshot of all of the objects (by name)
+
+        This is empty if the initial list has not completed in time.
+        """
+        self.synced.wait(SYNC_TIMEOUT)
+        with self.lock:
+            return dict(self.objs)
+
+    def observe(self, obj):
+        """Record an object we have just written or read"""
+        if not self._matches(obj):
+            # The watch would not keep it up to date
+            return
+        name = obj['metadata']['name']
+        with self.lock:
+            current = self.objs.get(name)
+            if current is None or _newer(
+                    obj['metadata']['resourceVersion'],
+                    current['metadata']['resourceVersion']):
+                self.objs[name] = obj
+
+    def forget(self, name):
+        """Remove an object we have just deleted"""
+        with self.lock:
+            self.objs.pop(name, None)
+
+
+class InformerRegistry:
+    """The informers for one kind, started on first use per namespace"""
+
+    def __init__(self, get_api, kind, selector=None, initial_events=False):
+        self.get_api = get_api
+        self.kind = kind
+        self.selector = selector
+        self.initial_events = initial_events
+        self.lock = threading.Lock()
+        self.informers = {}
+        self.listeners = []
+
+    def get(self, namespace):
+        with self.lock:
+            informer = self.informers.get(namespace)
+            if informer is None:
+                informer = Informer(self.get_api, self.kind, namespace,
+                                    self.selector, self.initial_events)
+                for listener in self.listeners:
+                    informer.add_listener(listener)
+                informer.start()
+                self.informers[namespace] = informer
+            return informer
+
+    def find(self, namespace):
+        # Return the informer for a namespace only if one is running
+        with self.lock:
+            return self.informers.get(namespace)
+
+    def namespaces(self):
+        with self.lock:
+            return set(self.informers)
+
+    def add_listener(self, func):
+        with self.lock:
+            self.listeners.append(func)
+            for informer in self.informers.values():
+                informer.add_listener(func)
+
+    def remove_listener(self, func):
+        with self.lock:
+            self.listeners.remove(func)
+            for informer in self.informers.values():
+                informer.listeners.remove(func)
+
+    def stop(self, namespace=None):
+        with self.lock:
+            if namespace is None:
+                namespaces = list(self.informers)
+            else:
+                namespaces = [namespace]
+            for ns in namespaces:
+                informer = self.informers.pop(ns, None)
+                if informer:
+                    informer.stop()
@@ -0,0 +1,151 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import functools
+import time
+import urllib.parse
+
+import kopf
+import prometheus_client
+
+# Most of what we time is either a single API request (milliseconds)
+# or a wait for something to start (minutes).
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60,
+           120, 300, 600, 1800)
+
+HANDLER_DURATION = prometheus_client.Histogram(
+    'zuul_operator_handler_duration_seconds',
+    'Time spent in each kopf handler',
+    ['handler', 'outcome'], buckets=BUCKETS)
+
+API_REQUESTS = prometheus_client.Counter(
+    'zuul_operator_api_requests_total',
+    'Requests made to the Kubernetes API server',
+    ['verb', 'resource', 'code'])
+
+API_REQUEST_DURATION = prometheus_client.Histogram(
+    'zuul_operator_api_request_duration_seconds',
+    'Time until the response headers of each Kubernetes API request',
+    ['verb', 'resource'], buckets=BUCKETS)
+
+APPLIED_OBJECTS = prometheus_client.Counter(
+    'zuul_operator_applied_objects_total',
+    'Objects passed to apply_file, by whether they needed writing',
+    ['kind', 'result'])
+
+APPLY_FILE_DURATION = prometheus_client.Histogram(
+    'zuul_operator_apply_file_duration_seconds',
+    'Time spent applying each template',
+    ['template'], buckets=BUCKETS)
+
+WAIT_DURATION = prometheus_client.Histogram(
+    'zuul_operator_wait_duration_seconds',
+    'Time spent waiting for objects to reach a condition',
+    ['wait', 'outcome'], buckets=BUCKETS)
+
+RECONFIGURE_DURATION = prometheus_client.Histogram(
+    'zuul_operator_reconfigure_pod_duration_seconds',
+    'Time to update the tenant config on and reconfigure each scheduler',
+    ['result'], buckets=BUCKETS)
+
+CONFIG_RESOURCES = prometheus_client.Gauge(
+    'zuul_operator_config_resources',
+    'The number of Zuul resources whose config secrets are watched')
+
+SHARD_MEMBERS = prometheus_client.Gauge(
+    'zuul_operator_shard_members',
+    'The number of live operator replicas in this shard group')
+
+
+def start(port, addr='0.0.0.0'):
+    prometheus_client.start_http_server(port, addr)
+
+
+def _outcome(e):
+    if e is None:
+        return 'success'
+    if isinstance(e, kopf.TemporaryError):
+        return 'temporary_error'
+    if isinstance(e, kopf.PermanentError):
+        return 'permanent_error'
+    if isinstance(e, asyncio.CancelledError):
+        return 'cancelled'
+    return 'error'
+
+
+def timed_handler(name):
+    """Record the duration and outcome of an async kopf handler"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kw):
+            start = time.monotonic()
+            error = None
+            try:
+                return await func(*args, **kw)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                HANDLER_DURATION.labels(name, _outcome(error)).observe(
+                    time.monotonic() - start)
+        return wrapper
+    return decorator
+
+
+def classify_request(method, url, content_type=None):
+    """Return the (verb, resource) of a Kubernetes API request"""
+    url = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qs(url.query)
+    parts = [p for p in url.path.split('/') if p]
+    if parts[:1] == ['api']:
+        rest = parts[2:]
+    elif parts[:1] == ['apis']:
+        rest = parts[3:]
+    else:
+        return method.lower(), 'other'
+    if len(rest) >= 3 and rest[0] == 'namespaces':
+        rest = rest[2:]
+    if not rest:
+        return method.lower(), 'other'
+    resource = rest[0]
+    named = len(rest) > 1
+    if len(rest) > 2:
+        resource = f'{resource}/{rest[2]}'
+    if query.get('watch') in (['true'], ['1']):
+        verb = 'watch'
+    elif method == 'GET':
+        verb = 'get' if named else 'list'
+    elif method == 'POST':
+        verb = 'create'
+    elif method == 'PUT':
+        verb = 'update'
+    elif method == 'PATCH':
+        if (content_type or '').startswith('application/apply-patch'):
+            verb = 'apply'
+        else:
+            verb = 'patch'
+    elif method == 'DELETE':
+        verb = 'delete' if named else 'deletecollection'
+    else:
+        verb = method.lower()
+    return verb, resource
+
+
+def observe_request(request, status, duration):
+    # request is a requests.PreparedRequest
+    verb, resource = classify_request(
+        request.method, request.url, request.headers.get('Content-Type'))
+    API_REQUESTS.labels(verb, resource, str(status)).inc()
+    API_REQUEST_DURATION.labels(verb, resource).observe(duration)
@@ -72,6 +72,12 @@ class PerconaXtraDBCluster(NamespacedAPIObject):
     kind = "PerconaXtraDBCluster"
 
 
+class Lease(NamespacedAPIObject):
+    version = "coordination.k8s.io/v1"
+    endpoint = "leases"
+    kind = "Lease"
+
+
 class ZuulObject(NamespacedAPIObject):
     version = "operator.zuul-ci.org/v1alpha2"
     endpoint = "zuuls"
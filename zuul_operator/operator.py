@@ -17,188 +17,562 @@ import collections
 
 import kopf
 import pykube
+import pykube.exceptions
 
+from . import dag
+from . import informer
+from . import metrics
 from . import objects
+from . import planner
+from . import sharding
+from . import tracing
+from . import utils
 from .zuul import Zuul
 
 
+EXECUTOR_LABELS = {
+    'app.kubernetes.io/part-of': 'zuul',
+    'app.kubernetes.io/component': 'zuul-executor',
+}
+
+# The executor StatefulSets, whose replicas are reflected in the status
+# of each Zuul.  Like the secret informers, these run only in the
+# namespaces of our Zuuls.
+executor_informers = informer.InformerRegistry(
+    utils.get_api, objects.StatefulSet, EXECUTOR_LABELS,
+    initial_events=True)
+utils.watch_applied_state(executor_informers)
+
+
 ConfigResource = collections.namedtuple('ConfigResource', [
     'attr', 'namespace', 'zuul_name', 'resource_name'])
 
 
-def memoize_secrets(memo, logger):
-    # (zuul_namespace, zuul) -> list of resources
-    memo.config_resources.clear()
-    new_resources = {}
-    # lookup all zuuls and update configmaps
-
-    api = pykube.HTTPClient(pykube.KubeConfig.from_env())
-    for namespace in objects.Namespace.objects(api):
-        for zuul in objects.ZuulObject.objects(api).filter(
-                namespace=namespace.name):
-            resources = new_resources.\
-                setdefault((namespace.name, zuul.name), [])
-            # Zuul tenant config
-            secret = zuul.obj['spec']['scheduler']['config']['secretName']
-            res = ConfigResource('spec.scheduler.config.secretName',
-                                 namespace.name, zuul.name, secret)
+def config_resources_for(namespace, name, spec):
+    resources = []
+    # Zuul tenant config
+    secret = spec['scheduler']['config']['secretName']
+    res = ConfigResource('spec.scheduler.config.secretName',
+                         namespace, name, secret)
+    resources.append(res)
+
+    # Nodepool config (only when using nodepool launcher type)
+    launcher = spec.get('launcher', {})
+    if launcher.get('type', 'nodepool') in ('nodepool', 'both'):
+        secret = launcher.get('config', {}).get('secretName')
+        if secret:
+            res = ConfigResource('spec.launcher.config.secretName',
+                                 namespace, name, secret)
             resources.append(res)
+    return resources
 
-            # Nodepool config (only when using nodepool launcher type)
-            launcher = zuul.obj['spec'].get('launcher', {})
-            if launcher.get('type', 'nodepool') in ('nodepool', 'both'):
-                secret = launcher.get('config', {}).get('secretName')
-                if secret:
-                    res = ConfigResource('spec.launcher.config.secretName',
-                                         namespace.name, zuul.name, secret)
-                    resources.append(res)
-    # Mutate the global instance
-    memo.config_resources.clear()
-    memo.config_resources.update(new_resources)
+
+def lookup_secrets():
+    # (zuul_namespace, zuul) -> list of resources
+    new_resources = {}
+    # lookup all zuuls (in every namespace) with a single list call
+
+    api = utils.get_api()
+    for zuul in objects.ZuulObject.objects(api).filter(
+            namespace=pykube.all):
+        new_resources[(zuul.namespace, zuul.name)] = config_resources_for(
+            zuul.namespace, zuul.name, zuul.obj['spec'])
+    return new_resources
+
+
+# How often to rebuild the secret index from a full list of Zuul
+# resources, in case an event was missed.
+SECRET_RESYNC_INTERVAL = 600
+
+
+def _unindex(memo, namespace, name):
+    for resource in memo.config_resources.pop((namespace, name), []):
+        key = (resource.namespace, resource.resource_name)
+        entries = [r for r in memo.secret_index.get(key, [])
+                   if r != resource]
+        if entries:
+            memo.secret_index[key] = entries
+        else:
+            memo.secret_index.pop(key, None)
+
+
+def _index(memo, namespace, name, resources):
+    _unindex(memo, namespace, name)
+    memo.config_resources[(namespace, name)] = resources
+    for resource in resources:
+        memo.secret_index.setdefault(
+            (resource.namespace, resource.resource_name), []).append(resource)
+
+
+# The index is only changed with memo.index_lock held, so that a resync
+# never overwrites what the handlers did while it was listing.
+
+async def index_zuul(memo, namespace, name, spec):
+    # Replace the entries for a single Zuul in the memo
+    async with memo.index_lock:
+        _index(memo, namespace, name,
+               config_resources_for(namespace, name, spec))
+    watch_namespaces(memo)
+
+
+async def unindex_zuul(memo, namespace, name):
+    # Remove the entries for a single Zuul from the memo
+    async with memo.index_lock:
+        _unindex(memo, namespace, name)
+    watch_namespaces(memo)
+
+
+def watch_namespaces(memo):
+    # Watch the Secrets and executors in the namespaces of the Zuuls we
+    # handle, and nowhere else.
+    namespaces = {namespace for namespace, name in memo.config_resources
+                  if sharding.owns(namespace)}
+    for registry in (utils.secret_informers, executor_informers):
+        for namespace in namespaces:
+            registry.get(namespace)
+        for namespace in registry.namespaces() - namespaces:
+            registry.stop(namespace)
+
+
+async def memoize_secrets(memo, logger):
+    # Merge a fresh list of every Zuul into the index, in case an event
+    # was missed.  The lock is held from the list onwards so that no
+    # handler changes the index in between.
+    async with memo.index_lock:
+        new_resources = await utils.run_blocking(lookup_secrets)
+        for namespace, name in set(memo.config_resources) - set(
+                new_resources):
+            _unindex(memo, namespace, name)
+        for (namespace, name), resources in new_resources.items():
+            if memo.config_resources.get((namespace, name)) != resources:
+                _index(memo, namespace, name, resources)
+    watch_namespaces(memo)
+
+
+async def resync_secrets(memo, logger):
+    while True:
+        await asyncio.sleep(SECRET_RESYNC_INTERVAL)
+        try:
+            await memoize_secrets(memo, logger)
+        except Exception:
+            logger.exception("Unable to resync secret index")
+
+
+def claim_zuuls(logger, old, new):
+    # Mark the Zuuls in the namespaces which have moved to us.  Besides
+    # recording the owner, this is an event for kopf, which then
+    # handles any change (or retry) their previous owner left undone.
+    api = utils.get_api()
+    zuuls = list(objects.ZuulObject.objects(api).filter(
+        namespace=pykube.all))
+    gained = set(sharding.gained(old, new, {z.namespace for z in zuuls}))
+    owner = sharding.identity()
+    for zuul in zuuls:
+        if zuul.namespace not in gained:
+            continue
+        if zuul.obj.get('status', {}).get('shard', {}).get('owner') == owner:
+            continue
+        try:
+            zuul.patch({'status': {'shard': {'owner': owner}}})
+        except pykube.exceptions.HTTPError as e:
+            logger.warning(f"Unable to claim {zuul.namespace}/"
+                           f"{zuul.name}: {e}")
 
 
 @kopf.on.startup()
-def startup(memo, logger, **kwargs):
+async def startup(memo, logger, settings=None, **kwargs):
     # Operator handlers (like this one) get a single global memo
     # object; resource handlers (like update) get a memo object for
     # that specific resource with items shallow-copied from the global
     # memo.
     #
-    # Initialize a dictionary here that we will mutate (but never
+    # Initialize dictionaries here that we will mutate (but never
     # overwrite) in all the handlers.
     memo.config_resources = {}
-    memoize_secrets(memo, logger)
+    # The inverse of config_resources, so that secret events can be
+    # matched without scanning every Zuul.
+    memo.secret_index = {}
+    memo.index_lock = asyncio.Lock()
+    # The executor replica counts last written to each Zuul's status,
+    # those still to be written, and the tasks writing them.
+    memo.executor_status = {}
+    memo.executor_desired = {}
+    memo.executor_writers = {}
+    # The running update for each changed config secret, and those
+    # which changed again since it started.
+    memo.secret_updates = {}
+    memo.secret_pending = set()
+    # Limit the number of Zuul resources reconciled at once; the
+    # handlers themselves are async and otherwise run concurrently.
+    memo.reconcile_limit = asyncio.Semaphore(
+        utils.MAX_CONCURRENT_RECONCILES)
+    metrics.CONFIG_RESOURCES.set_function(
+        lambda: len(memo.config_resources))
+    loop = asyncio.get_running_loop()
+
+    def secret_listener(event_type, obj, old):
+        # Called from the watch threads.  Like kopf's update handlers,
+        # this ignores new and deleted secrets.
+        if event_type != 'MODIFIED':
+            return
+        if old is not None and obj.get('data') == old.get('data'):
+            return
+        loop.call_soon_threadsafe(
+            schedule_secret_update, memo, logger,
+            obj['metadata']['namespace'], obj['metadata']['name'])
+    memo.secret_listener = secret_listener
+    utils.secret_informers.add_listener(secret_listener)
+
+    def executor_listener(event_type, obj, old):
+        # Called from the watch threads
+        loop.call_soon_threadsafe(
+            executor_event, event_type, obj, logger, memo)
+    memo.executor_listener = executor_listener
+    executor_informers.add_listener(executor_listener)
+    await memoize_secrets(memo, logger)
+    # After this the memo is maintained by the Zuul handlers; the
+    # periodic full rebuild is only a consistency check.
+    memo.resync_task = asyncio.ensure_future(resync_secrets(memo, logger))
+    if sharding.enabled():
+        async def on_gain(old, new):
+            await utils.run_blocking(claim_zuuls, logger, old, new)
+            watch_namespaces(memo)
+        await sharding.start(settings, on_gain)
+
+
+@kopf.on.cleanup()
+async def cleanup(memo, logger, **kwargs):
+    task = getattr(memo, 'resync_task', None)
+    if task:
+        task.cancel()
+    for task in list(getattr(memo, 'secret_updates', {}).values()):
+        task.cancel()
+    for task in list(getattr(memo, 'executor_writers', {}).values()):
+        task.cancel()
+    listener = getattr(memo, 'secret_listener', None)
+    if listener:
+        utils.secret_informers.remove_listener(listener)
+    listener = getattr(memo, 'executor_listener', None)
+    if listener:
+        executor_informers.remove_listener(listener)
+        executor_informers.stop()
+    if sharding.enabled():
+        await sharding.stop()
+    utils.secret_informers.stop()
+
+
+def when_owned(namespace, **_):
+    return sharding.owns(namespace)
 
 
 def when_update_secret(name, namespace, memo, logger, **_):
-    logger.info(f"Checking update predicate for {namespace}/{name}")
-
-    for resources in memo.config_resources.values():
-        for resource in resources:
-            if (resource.namespace == namespace or
-                resource.resource_name == name):
-                return True
-
-    return False
-
-
-@kopf.on.update('secrets', when=when_update_secret)
-def update_secret(name, namespace, logger, memo, **kwargs):
-    # if this configmap isn't known, ignore
-    logger.info(f"Update secret {namespace}/{name}")
-
-    api = pykube.HTTPClient(pykube.KubeConfig.from_env())
-    for ((zuul_namespace, zuul_name), resources) in \
-        memo.config_resources.items():
-        for resource in resources:
-            if (resource.namespace != namespace or
-                resource.resource_name != name):
+    return (sharding.owns(namespace) and
+            (namespace, name) in memo.secret_index)
+
+
+# How long to wait before retrying a failed secret update, unless it
+# asks for a different delay.
+SECRET_RETRY_DELAY = 60
+
+
+def schedule_secret_update(memo, logger, namespace, name):
+    # Start handling a changed secret, unless it is already being
+    # handled; then that goes round again once it is done.
+    if not when_update_secret(name, namespace, memo, logger):
+        return
+    key = (namespace, name)
+    if key in memo.secret_updates:
+        memo.secret_pending.add(key)
+        return
+    memo.secret_updates[key] = asyncio.ensure_future(
+        handle_secret_update(memo, logger, namespace, name))
+
+
+async def handle_secret_update(memo, logger, namespace, name):
+    # Run update_secret for the latest version of a secret until it
+    # succeeds, as kopf would for a handler.
+    key = (namespace, name)
+    try:
+        while when_update_secret(name, namespace, memo, logger):
+            memo.secret_pending.discard(key)
+            delay = None
+            try:
+                body = await utils.run_blocking(
+                    utils.secret_informers.get(namespace).get, name)
+                await update_secret(name=name, namespace=namespace,
+                                    body=body, logger=logger, memo=memo)
+            except pykube.exceptions.ObjectDoesNotExist:
+                return
+            except kopf.PermanentError as e:
+                logger.error(f"Update of secret {namespace}/{name} "
+                             f"failed: {e}")
+            except kopf.TemporaryError as e:
+                logger.warning(f"Update of secret {namespace}/{name} "
+                               f"failed: {e}")
+                delay = e.delay or SECRET_RETRY_DELAY
+            except Exception:
+                logger.exception(f"Update of secret {namespace}/{name} "
+                                 f"failed")
+                delay = SECRET_RETRY_DELAY
+            if key in memo.secret_pending:
                 continue
-            logger.info(f"Affects zuul {zuul_namespace}/{zuul_name}")
-            zuul_obj = objects.ZuulObject.objects(api).filter(
-                namespace=zuul_namespace).get(name=zuul_name)
-            zuul = Zuul(namespace, zuul_name, logger, zuul_obj.obj['spec'])
-            if resource.attr == 'spec.scheduler.config.secretName':
-                zuul.smart_reconfigure()
-            if resource.attr == 'spec.launcher.config.secretName':
-                zuul.create_nodepool()
-
-
-@kopf.on.create('zuuls', backoff=10)
-def create_fn(spec, name, namespace, logger, memo, **kwargs):
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+    finally:
+        memo.secret_updates.pop(key, None)
+
+
+# Config secrets are not watched with kopf, which would watch (and
+# filter in Python) every Secret in the cluster; instead the secret
+# informers, which run only in the namespaces of our Zuuls, call
+# secret_listener (see startup) when one changes.
+@metrics.timed_handler('update_secret')
+@tracing.traced_handler('update_secret', 'secret')
+async def update_secret(name, namespace, body, logger, memo, **kwargs):
+    logger.info(f"Update secret {namespace}/{name}")
+    # Our own watch may not have seen this version yet.
+    utils.secret_informers.get(namespace).observe(dict(body))
+
+    api = utils.get_api()
+    failed = []
+    for resource in list(memo.secret_index.get((namespace, name), [])):
+        zuul_name = resource.zuul_name
+        logger.info(f"Affects zuul {resource.namespace}/{zuul_name}")
+        try:
+            zuul_obj = await utils.run_blocking(
+                objects.ZuulObject.objects(api).filter(
+                    namespace=resource.namespace).get,
+                name=zuul_name)
+        except pykube.exceptions.ObjectDoesNotExist:
+            # Deleted since the index was built
+            await unindex_zuul(memo, resource.namespace, zuul_name)
+            continue
+        zuul = Zuul(namespace, zuul_name, logger, zuul_obj.obj['spec'])
+        # There is no kopf handler context here for kopf.adopt
+        with utils.owned_by(zuul_obj.obj):
+            async with memo.reconcile_limit:
+                if resource.attr == 'spec.scheduler.config.secretName':
+                    status = await tracing.traced(
+                        'smart_reconfigure', zuul.smart_reconfigure(),
+                        **{'zuul.namespace': resource.namespace,
+                           'zuul.name': zuul_name})
+                    if status and not status['success']:
+                        failed.append(f"{resource.namespace}/{zuul_name}")
+                if resource.attr == 'spec.launcher.config.secretName':
+                    await tracing.traced(
+                        'create_nodepool', zuul.create_nodepool(),
+                        **{'zuul.namespace': resource.namespace,
+                           'zuul.name': zuul_name})
+    if failed:
+        # The per-pod results are on the status of each Zuul
+        raise kopf.TemporaryError(
+            f"Smart reconfigure failed for {', '.join(failed)}", delay=60)
+
+
+@kopf.on.create('zuuls', backoff=10, when=when_owned)
+@metrics.timed_handler('create_fn')
+@tracing.traced_handler('create_fn', 'zuul')
+async def create_fn(spec, name, namespace, logger, memo, status=None,
+                    **kwargs):
+    checkpoints = (status or {}).get('checkpoints') or {}
+    async with memo.reconcile_limit:
+        return await reconcile_create(spec, name, namespace, logger, memo,
+                                      checkpoints)
+
+
+async def reconcile_create(spec, name, namespace, logger, memo,
+                           checkpoints=None):
     logger.info(f"Create zuul {namespace}/{name}")
 
     zuul = Zuul(namespace, name, logger, spec)
+    # The slow installation steps are checkpointed in the status of
+    # the Zuul resource, so that a retry (or a restarted operator)
+    # resumes at the first step which has not completed or whose
+    # inputs have changed since.  The checkpoints are removed once
+    # the whole install has succeeded.
+    graph = dag.StepGraph(logger, checkpoints, zuul.save_checkpoint)
+    inputs = zuul.checkpoint_inputs()
     # Get DB installation started first; it's slow and has no
     # dependencies.
-    zuul.install_db()
+    graph.add('install_db', zuul.install_db,
+              inputs=inputs['install_db'])
+    graph.add('wait_for_db', zuul.wait_for_db, requires=['install_db'],
+              inputs=inputs['wait_for_db'])
     # Install Cert-Manager and request the CA cert before installing
     # ZK because the CRDs must exist.
-    zuul.install_cert_manager()
-    zuul.wait_for_cert_manager()
-    zuul.create_cert_manager_ca()
+    graph.add('install_cert_manager', zuul.install_cert_manager,
+              inputs=inputs['install_cert_manager'])
+    graph.add('wait_for_cert_manager', zuul.wait_for_cert_manager,
+              requires=['install_cert_manager'],
+              inputs=inputs['wait_for_cert_manager'])
+    graph.add('create_cert_manager_ca', zuul.create_cert_manager_ca,
+              requires=['wait_for_cert_manager'],
+              inputs=inputs['create_cert_manager_ca'])
     # Now we can install ZK
-    zuul.install_zk()
-    # Wait for both to finish
-    zuul.wait_for_zk()
-    zuul.wait_for_db()
-
-    zuul.write_zuul_conf()
-    zuul.create_zuul()
-
-    memoize_secrets(memo, logger)
-    # We can set a status with something like:
-    # return {'message': 'hello world'}
-
-
-@kopf.on.update('zuuls', backoff=10)
-def update_fn(name, namespace, logger, old, new, memo, **kwargs):
+    graph.add('install_zk', zuul.install_zk,
+              requires=['create_cert_manager_ca'],
+              inputs=inputs['install_zk'])
+    graph.add('wait_for_zk', zuul.wait_for_zk, requires=['install_zk'],
+              inputs=inputs['wait_for_zk'])
+    # These only depend on the spec and user-supplied secrets, which
+    # may have changed at any time, so they are always run.
+    graph.add('prepare_keystore', zuul.prepare_keystore)
+    graph.add('prepare_registry', zuul.prepare_registry)
+    graph.add('prepare_nodepool', zuul.prepare_nodepool)
+
+    graph.add('write_zuul_conf', zuul.write_zuul_conf,
+              requires=['wait_for_db', 'prepare_keystore'])
+    graph.add('create_zuul', zuul.create_zuul,
+              requires=['write_zuul_conf', 'wait_for_zk',
+                        'prepare_registry', 'prepare_nodepool'])
+    try:
+        summary = await graph.run()
+    except Exception:
+        # So that the retry resumes after every completed step
+        await zuul.write_checkpoints()
+        raise
+    if checkpoints or zuul.checkpointed:
+        await zuul.clear_checkpoints()
+
+    await index_zuul(memo, namespace, name, spec)
+    return {'install': summary}
+
+
+@kopf.on.update('zuuls', backoff=10, when=when_owned)
+@metrics.timed_handler('update_fn')
+@tracing.traced_handler('update_fn', 'zuul')
+async def update_fn(name, namespace, logger, old, new, memo, **kwargs):
+    async with memo.reconcile_limit:
+        await reconcile_update(name, namespace, logger, old, new, memo)
+
+
+async def reconcile_update(name, namespace, logger, old, new, memo):
     logger.info(f"Update zuul {namespace}/{name}")
 
     old = old['spec']
     new = new['spec']
 
+    plan = planner.Plan(old, new)
+    logger.info(f"Update plan: {plan.describe()}")
+
     zuul = Zuul(namespace, name, logger, new)
-    conf_changed = False
-    spec_changed = False
-    if new.get('database') != old.get('database'):
-        logger.info("Database changed")
-        conf_changed = True
+    if planner.DATABASE in plan:
         # redo db stuff
-        zuul.install_db()
-        zuul.wait_for_db()
+        await tracing.traced('install_db', zuul.install_db())
+        await tracing.traced('wait_for_db', zuul.wait_for_db())
 
-    if new.get('zookeeper') != old.get('zookeeper'):
-        logger.info("ZooKeeper changed")
-        conf_changed = True
+    if planner.ZOOKEEPER in plan:
         # redo zk
-        zuul.install_cert_manager()
-        zuul.wait_for_cert_manager()
-        zuul.create_cert_manager_ca()
+        await tracing.traced('install_cert_manager',
+                             zuul.install_cert_manager())
+        await tracing.traced('wait_for_cert_manager',
+                             zuul.wait_for_cert_manager())
+        await tracing.traced('create_cert_manager_ca',
+                             zuul.create_cert_manager_ca())
         # Now we can install ZK
-        zuul.install_zk()
-        zuul.wait_for_zk()
-    if new.get('connections') != old.get('connections'):
-        logger.info("Connections changed")
-        conf_changed = True
-
-    if new.get('auth') != old.get('auth'):
-        logger.info("Auth changed")
-        conf_changed = True
-
-    for key in ['executor', 'merger', 'scheduler', 'web', 'fingergw']:
-        if new.get(key) != old.get(key):
-            logger.info(f"{key} changed")
-            conf_changed = True
-
-    old_launcher = old.get('launcher', {})
-    new_launcher = new.get('launcher', {})
-    if (old_launcher.get('type') != new_launcher.get('type') or
-            old_launcher.get('connection_filter') != new_launcher.get('connection_filter')):
-        logger.info("launcher conf changed")
-        conf_changed = True
-
-    for key in ['registry', 'launcher', 'connections', 'externalConfig',
-                'imagePrefix', 'imagePullSecrets', 'zuulImageVersion',
-                'zuulPreviewImageVersion', 'zuulRegistryImageVersion',
-                'nodepoolImageVersion']:
-        if new.get(key) != old.get(key):
-            logger.info(f"{key} changed")
-            spec_changed = True
-
-    if conf_changed:
-        spec_changed = True
-        zuul.write_zuul_conf()
-
-    if spec_changed:
-        zuul.create_zuul()
-
-    if conf_changed:
-        if spec_changed:
-            zuul.wait_for_statefulset('zuul-scheduler')
-        zuul.smart_reconfigure()
-
-    memoize_secrets(memo, logger)
+        await tracing.traced('install_zk', zuul.install_zk())
+        await tracing.traced('wait_for_zk', zuul.wait_for_zk())
+
+    if planner.CONF in plan:
+        await tracing.traced('write_zuul_conf', zuul.write_zuul_conf())
+
+    if planner.REGISTRY in plan and zuul.spec['registry']['count']:
+        await tracing.traced('create_registry', zuul.create_registry())
+
+    # Count-only changes are a single request for each workload
+    await asyncio.gather(*[
+        tracing.traced('scale', zuul.scale(component, kind, set_name, path),
+                       **{'k8s.kind': kind, 'k8s.name': set_name})
+        for component, (kind, set_name, path) in plan.scale.items()])
+
+    if plan.components:
+        await tracing.traced('apply_zuul', zuul.apply_zuul(plan.components),
+                             components=','.join(sorted(plan.components)))
+
+    if planner.NODEPOOL in plan or planner.ZUUL_LAUNCHER in plan:
+        await tracing.traced('create_launchers', zuul.create_launchers(
+            nodepool=planner.NODEPOOL in plan,
+            zuul_launcher=planner.ZUUL_LAUNCHER in plan))
+
+    if planner.ROLLOUT in plan:
+        await tracing.traced('wait_for_statefulset',
+                             zuul.wait_for_statefulset('zuul-scheduler'))
+
+    status = None
+    if planner.RECONFIGURE in plan:
+        status = await tracing.traced('smart_reconfigure',
+                                      zuul.smart_reconfigure())
+
+    await index_zuul(memo, namespace, name, new)
+    if status and not status['success']:
+        # The per-pod results are on the status of the Zuul
+        raise kopf.TemporaryError(
+            f"Smart reconfigure failed for {namespace}/{name}", delay=60)
+
+
+# Not kopf.on.delete: without a finalizer (which we don't need, since
+# everything is garbage collected through owner references) kopf does
+# not run delete handlers at all.
+@kopf.on.event('zuuls')
+async def delete_fn(event, name, namespace, logger, memo, **kwargs):
+    if event['type'] != 'DELETED':
+        return
+    logger.info(f"Delete zuul {namespace}/{name}")
+    await unindex_zuul(memo, namespace, name)
+    memo.executor_status.pop((namespace, name), None)
+    memo.executor_desired.pop((namespace, name), None)
+
+
+def executor_status(body):
+    # The executor part of the Zuul status, used by the Zuul scale
+    # subresource.
+    labels = body['spec']['selector'].get('matchLabels', {})
+    return {
+        'replicas': body.get('status', {}).get('replicas', 0),
+        'selector': ','.join(f'{k}={v}' for k, v in sorted(labels.items())),
+    }
+
+
+def executor_event(event_type, body, logger, memo):
+    # Called (on the event loop) for each change to an executor
+    # StatefulSet seen by executor_informers.
+    namespace = body['metadata']['namespace']
+    labels = body['metadata'].get('labels') or {}
+    key = (namespace, labels.get('app.kubernetes.io/instance'))
+    if not sharding.owns(namespace) or key not in memo.config_resources:
+        return
+    if event_type == 'DELETED':
+        status = {'replicas': 0, 'selector': ''}
+    else:
+        status = executor_status(body)
+    memo.executor_desired[key] = status
+    if key not in memo.executor_writers:
+        memo.executor_writers[key] = asyncio.ensure_future(
+            write_executor_status(memo, logger, key))
+
+
+async def write_executor_status(memo, logger, key):
+    # Write the latest executor status of a Zuul until it is in place;
+    # events arriving meanwhile only change what is written next, so
+    # an older status never overwrites a newer one.
+    namespace, zuul_name = key
+    api = utils.get_api()
+    obj = objects.ZuulObject(api, {
+        'metadata': {'namespace': namespace, 'name': zuul_name}})
+    try:
+        while (key in memo.executor_desired and
+               memo.executor_status.get(key) != memo.executor_desired[key]):
+            status = memo.executor_desired[key]
+            try:
+                await utils.run_blocking(
+                    obj.patch, {'status': {'executor': status}})
+            except pykube.exceptions.HTTPError as e:
+                logger.warning(f"Unable to update status of {key}: {e}")
+                return
+            memo.executor_status[key] = status
+    finally:
+        memo.executor_writers.pop(key, None)
 
 
 class ZuulOperator:
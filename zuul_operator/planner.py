@@ -0,0 +1,184 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# The actions which may be needed to carry out a change to a Zuul
+# spec.
+DATABASE = 'database'
+ZOOKEEPER = 'zookeeper'
+CONF = 'conf'
+REGISTRY = 'registry'
+NODEPOOL = 'nodepool'
+ZUUL_LAUNCHER = 'zuul-launcher'
+ROLLOUT = 'rollout'
+RECONFIGURE = 'reconfigure'
+
+# The workloads in zuul.yaml (by component label) which may be
+# applied individually.
+SCHEDULER = 'zuul-scheduler'
+EXECUTOR = 'zuul-executor'
+MERGER = 'zuul-merger'
+WEB = 'zuul-web'
+FINGERGW = 'zuul-fingergw'
+PREVIEW = 'zuul-preview'
+COMPONENTS = {SCHEDULER, EXECUTOR, MERGER, WEB, FINGERGW, PREVIEW}
+
+# Everything which runs a container image built from the same spec.
+WORKLOADS = COMPONENTS | {REGISTRY, NODEPOOL, ZUUL_LAUNCHER}
+
+# What needs to be done when something under a spec path changes.
+# The longest matching path wins; a change to a path not covered here
+# is handled as a change to everything.
+RULES = {
+    ('database',): {DATABASE, CONF},
+    ('zookeeper',): {ZOOKEEPER, CONF, NODEPOOL},
+    ('connections',): {CONF},
+    ('auth',): {CONF},
+    ('scheduler',): {CONF},
+    ('scheduler', 'count'): set(),
+    ('scheduler', 'storageClassName'): {SCHEDULER},
+    ('scheduler', 'config', 'secretName'): {SCHEDULER, RECONFIGURE},
+    ('scheduler', 'config', 'push'): {CONF},
+    ('executor',): {CONF},
+    ('executor', 'count'): set(),
+    ('executor', 'sshkey'): {EXECUTOR},
+    ('executor', 'terminationGracePeriodSeconds'): {EXECUTOR},
+    ('executor', 'storageClassName'): {EXECUTOR},
+    ('executor', 'storageSize'): {EXECUTOR},
+    ('merger',): {CONF},
+    ('merger', 'count'): set(),
+    ('merger', 'storageClassName'): {MERGER},
+    ('merger', 'storageSize'): {MERGER},
+    ('web',): {CONF},
+    ('web', 'count'): set(),
+    ('fingergw',): {CONF},
+    ('fingergw', 'count'): set(),
+    ('preview',): {PREVIEW},
+    ('preview', 'count'): set(),
+    ('registry',): {REGISTRY},
+    ('launcher',): {NODEPOOL, ZUUL_LAUNCHER},
+    ('launcher', 'type'): {CONF, NODEPOOL, ZUUL_LAUNCHER},
+    ('launcher', 'connection_filter'): {CONF},
+    ('launcher', 'config'): {NODEPOOL},
+    ('launcher', 'count'): set(),
+    ('launcher', 'storageClassName'): {ZUUL_LAUNCHER},
+    ('launcher', 'storageSize'): {ZUUL_LAUNCHER},
+    ('externalConfig',): {NODEPOOL, ZUUL_LAUNCHER},
+    ('jobVolumes',): {CONF, EXECUTOR},
+    ('env',): set(WORKLOADS),
+    ('imagePrefix',): set(WORKLOADS),
+    ('imagePullSecrets',): set(WORKLOADS),
+    ('zuulImageVersion',): COMPONENTS - {PREVIEW} | {ZUUL_LAUNCHER},
+    ('zuulPreviewImageVersion',): {PREVIEW},
+    ('zuulRegistryImageVersion',): {REGISTRY},
+    ('nodepoolImageVersion',): {NODEPOOL},
+}
+
+# Replica counts which can be changed by scaling a workload (through
+# its scale subresource) rather than applying it again:
+# spec path -> (action, kind, name).
+SCALE_PATHS = {
+    ('executor', 'count'): (EXECUTOR, 'StatefulSet', 'zuul-executor'),
+    ('merger', 'count'): (MERGER, 'StatefulSet', 'zuul-merger'),
+    ('web', 'count'): (WEB, 'Deployment', 'zuul-web'),
+    ('fingergw', 'count'): (FINGERGW, 'Deployment', 'zuul-fingergw'),
+    ('preview', 'count'): (PREVIEW, 'Deployment', 'zuul-preview'),
+    ('launcher', 'count'): (ZUUL_LAUNCHER, 'StatefulSet', 'zuul-launcher'),
+}
+
+# Everything, for changes we know nothing about.
+EVERYTHING = {CONF, REGISTRY} | WORKLOADS
+
+# The order in which the actions are described in the log.
+ORDER = [DATABASE, ZOOKEEPER, CONF, REGISTRY] + sorted(COMPONENTS) + [
+    NODEPOOL, ZUUL_LAUNCHER, ROLLOUT, RECONFIGURE]
+
+
+def diff_paths(old, new, path=()):
+    """Return the paths (as tuples of keys) of every changed value
+
+    Dictionaries are compared key by key; anything else (including
+    lists) is compared as a whole.
+    """
+    if old == new:
+        return []
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return [path]
+    paths = []
+    for key in sorted(set(old) | set(new), key=str):
+        paths.extend(diff_paths(old.get(key), new.get(key), path + (key,)))
+    return paths
+
+
+def actions_for(path):
+    for i in range(len(path), 0, -1):
+        actions = RULES.get(path[:i])
+        if actions is not None:
+            return set(actions)
+    return set(EVERYTHING)
+
+
+class Plan:
+    """The actions needed to move from one Zuul spec to another"""
+
+    def __init__(self, old, new):
+        self.reasons = {}
+        # action -> (kind, name, spec path of the count)
+        self.scale = {}
+        for path in diff_paths(old, new):
+            if path in SCALE_PATHS:
+                action, kind, name = SCALE_PATHS[path]
+                self.scale[action] = (kind, name, path)
+            for action in actions_for(path):
+                self.reasons.setdefault(action, []).append(
+                    '.'.join(str(p) for p in path))
+        actions = set(self.reasons)
+        if CONF in actions:
+            # Every Zuul component (and zuul-launcher) reads zuul.conf,
+            # so they are all applied again; only those whose part of
+            # it changed are restarted.  The scheduler is reconfigured
+            # afterwards.
+            actions |= COMPONENTS | {ZUUL_LAUNCHER, RECONFIGURE}
+        if SCHEDULER in actions and RECONFIGURE in actions:
+            actions.add(ROLLOUT)
+        self.actions = actions
+        # Anything being applied anyway gets its new count that way.
+        for action in list(self.scale):
+            if action in actions:
+                del self.scale[action]
+
+    def __contains__(self, action):
+        return action in self.actions
+
+    def __bool__(self):
+        return bool(self.actions or self.scale)
+
+    @property
+    def components(self):
+        return self.actions & COMPONENTS
+
+    def describe(self):
+        if not self:
+            return "nothing to do"
+        steps = []
+        for action, (kind, name, path) in sorted(self.scale.items()):
+            steps.append(f"scale {name} ({'.'.join(path)})")
+        for action in ORDER:
+            if action not in self.actions:
+                continue
+            reasons = self.reasons.get(action)
+            if reasons:
+                steps.append(f"{action} ({', '.join(reasons)})")
+            else:
+                steps.append(action)
+        return ', '.join(steps)
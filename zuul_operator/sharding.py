@@ -0,0 +1,292 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Share the Zuul resources between several operator replicas
+
+Each replica in a shard group holds a Lease (labelled with the group
+name) which it renews every RENEW_INTERVAL seconds.  The live members
+of the group are the holders of the Leases which have been renewed
+within their lease duration; every replica places them on the same
+consistent hash ring and handles only the namespaces which hash to
+itself.  When a replica stops (or stops renewing its Lease), its
+namespaces move to the other members, and only those.
+
+Liveness is judged by when this replica last saw each Lease change
+rather than by the renewTime written in it, so the replicas' clocks
+need not agree.
+
+Sharding is off unless configure() is called; owns() is then always
+true.
+"""
+
+import asyncio
+import bisect
+import concurrent.futures
+import datetime
+import hashlib
+import logging
+import time
+
+import kopf
+import pykube
+
+from . import metrics
+from . import objects
+from . import utils
+
+log = logging.getLogger("zuul_operator.sharding")
+
+SHARD_LABEL = 'operator.zuul-ci.org/shard-group'
+
+# A member whose Lease has not changed for this long is considered
+# gone.  It is renewed a few times within that.
+LEASE_DURATION = 30
+RENEW_INTERVAL = 10
+
+# Points on the hash ring per member; more points spread the
+# namespaces more evenly.
+VIRTUAL_NODES = 256
+
+_shard = None
+
+
+def _hash(key):
+    return int(hashlib.sha256(key.encode('utf8')).hexdigest()[:16], 16)
+
+
+def _now():
+    # A Kubernetes MicroTime
+    return datetime.datetime.now(datetime.timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class HashRing:
+    def __init__(self, members):
+        self.members = frozenset(members)
+        points = sorted((_hash(f'{member}#{i}'), member)
+                        for member in self.members
+                        for i in range(VIRTUAL_NODES))
+        self.hashes = [p[0] for p in points]
+        self.owners = [p[1] for p in points]
+
+    def lookup(self, key):
+        if not self.owners:
+            return None
+        i = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.owners[i]
+
+
+class Shard:
+    def __init__(self, group, namespace, identity):
+        self.group = group
+        self.namespace = namespace
+        self.identity = identity
+        self.lease_name = f'{group}-{identity}'
+        self.ring = HashRing([identity])
+        # holder -> (renewTime, monotonic time it was first seen)
+        self.observed = {}
+        self.renewed = None
+        self.task = None
+        # Our own thread for the Lease calls, so that they are not
+        # held up behind reconciles in the shared pool; if they were,
+        # we would give up our namespaces while still handling them.
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            1, thread_name_prefix='zuul-operator-shard')
+
+    def owns(self, namespace):
+        if (self.renewed is None or
+            time.monotonic() - self.renewed > LEASE_DURATION):
+            # Others will have taken over our namespaces by now
+            return False
+        return self.ring.lookup(namespace) == self.identity
+
+    def renew(self):
+        api = utils.get_api()
+        lease = objects.Lease(api, {
+            'apiVersion': 'coordination.k8s.io/v1',
+            'kind': 'Lease',
+            'metadata': {
+                'name': self.lease_name,
+                'namespace': self.namespace,
+                'labels': {SHARD_LABEL: self.group},
+            },
+            'spec': {
+                'holderIdentity': self.identity,
+                'leaseDurationSeconds': LEASE_DURATION,
+                'renewTime': _now(),
+            },
+        })
+        try:
+            lease.patch({'spec': lease.obj['spec']})
+        except pykube.exceptions.HTTPError as e:
+            if e.code != 404:
+                raise
+            lease.create()
+        self.renewed = time.monotonic()
+
+    def members(self):
+        api = utils.get_api()
+        leases = objects.Lease.objects(api).filter(
+            namespace=self.namespace,
+            selector={SHARD_LABEL: self.group})
+        now = time.monotonic()
+        observed = {}
+        members = {self.identity}
+        for lease in leases:
+            spec = lease.obj.get('spec', {})
+            holder = spec.get('holderIdentity')
+            if not holder:
+                continue
+            renew_time = spec.get('renewTime')
+            last = self.observed.get(holder)
+            if last and last[0] == renew_time:
+                observed[holder] = last
+            else:
+                observed[holder] = (renew_time, now)
+            duration = spec.get('leaseDurationSeconds', LEASE_DURATION)
+            if now - observed[holder][1] <= duration:
+                members.add(holder)
+        self.observed = observed
+        return members
+
+    def release(self):
+        # Hand our namespaces over now rather than when the Lease
+        # expires.
+        api = utils.get_api()
+        lease = objects.Lease(api, {
+            'metadata': {'name': self.lease_name,
+                         'namespace': self.namespace}})
+        try:
+            lease.delete()
+        except pykube.exceptions.HTTPError as e:
+            if e.code != 404:
+                raise
+        self.renewed = None
+
+    async def run_blocking(self, func):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func)
+
+    async def update(self):
+        # Renew our Lease and rebuild the ring; return the previous
+        # ring if the membership changed.
+        await self.run_blocking(self.renew)
+        members = await self.run_blocking(self.members)
+        metrics.SHARD_MEMBERS.set(len(members))
+        if members == self.ring.members:
+            return None
+        old = self.ring
+        self.ring = HashRing(members)
+        log.info("Shard group %s members: %s", self.group,
+                 ', '.join(sorted(members)))
+        return old
+
+    async def gain(self, on_gain, old, new, previous):
+        # Run on_gain in order, but apart from the renewals, which
+        # must not wait for it.
+        if previous:
+            await asyncio.wait([previous])
+        try:
+            await on_gain(old, new)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Unable to take over namespaces in shard group %s",
+                          self.group)
+
+    async def run(self, on_gain):
+        gain_task = None
+        try:
+            while True:
+                await asyncio.sleep(RENEW_INTERVAL)
+                try:
+                    old = await self.update()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    log.exception("Unable to update shard group %s",
+                                  self.group)
+                    continue
+                if old:
+                    gain_task = asyncio.ensure_future(self.gain(
+                        on_gain, old, self.ring, gain_task))
+        finally:
+            if gain_task:
+                gain_task.cancel()
+
+
+class ShardedDiffBaseStorage(kopf.AnnotationsDiffBaseStorage):
+    """Only record the last handled spec of resources we own
+
+    Kopf records the spec as handled even when the when= filters of
+    all its handlers fail, which would leave the owner of the resource
+    with nothing to do.
+    """
+
+    def store(self, *, body, patch, essence):
+        if owns(body.get('metadata', {}).get('namespace')):
+            super().store(body=body, patch=patch, essence=essence)
+
+
+def configure(group, namespace, identity):
+    """Handle only the namespaces assigned to us in a shard group"""
+    global _shard
+    if not group:
+        _shard = None
+        return
+    _shard = Shard(group, namespace, identity)
+
+
+def enabled():
+    return _shard is not None
+
+
+def identity():
+    return _shard.identity
+
+
+def owns(namespace):
+    """Whether this replica handles the resources in a namespace"""
+    if _shard is None:
+        return True
+    return _shard.owns(namespace)
+
+
+def gained(old, new, namespaces):
+    """The namespaces which moved to us from the old ring to the new"""
+    identity = _shard.identity
+    return [ns for ns in namespaces
+            if new.lookup(ns) == identity and old.lookup(ns) != identity]
+
+
+async def start(settings, on_gain):
+    """Join the shard group
+
+    Kopf's own peering would pause all but one replica, so it is
+    turned off.  on_gain is awaited with the old and new rings when
+    the membership changes, and once with an empty old ring now.
+    """
+    settings.peering.standalone = True
+    settings.persistence.diffbase_storage = ShardedDiffBaseStorage()
+    await _shard.update()
+    await on_gain(HashRing([]), _shard.ring)
+    _shard.task = asyncio.ensure_future(_shard.run(on_gain))
+
+
+async def stop():
+    if _shard.task:
+        _shard.task.cancel()
+        _shard.task = None
+    await _shard.run_blocking(_shard.release)
+    _shard.executor.shutdown(wait=False)
@@ -0,0 +1,150 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import collections.abc
+import copy
+import functools
+import hashlib
+import json
+import threading
+
+import jinja2
+import yaml
+
+# Use the C loader when PyYAML was built with libyaml; the bundled
+# operator manifests are many thousands of lines long.
+YAMLLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# The number of rendered-and-parsed templates to keep.  Each Zuul
+# renders a handful of templates (plus one per nodepool provider),
+# and the cert-manager and PXC bundles are shared by all of them.
+DOCUMENT_CACHE_SIZE = 256
+
+
+def zuul_to_json(x):
+    return json.dumps(x)
+
+
+# A single environment for the whole process so that each template
+# is only loaded and compiled once.
+env = jinja2.Environment(
+    loader=jinja2.PackageLoader('zuul_operator', 'templates'))
+env.filters['zuul_to_json'] = zuul_to_json
+
+
+def render(name, **kw):
+    return env.get_template(name).render(**kw)
+
+
+@functools.lru_cache()
+def source_hash(*names):
+    # A hash of the unrendered source of the named templates
+    h = hashlib.sha256()
+    for name in names:
+        source, filename, uptodate = env.loader.get_source(env, name)
+        h.update(source.encode('utf8'))
+    return h.hexdigest()
+
+
+def _normalize(value):
+    # Reduce render arguments to plain JSON types so that equal
+    # arguments always hash alike.  Anything else is refused rather
+    # than hashed by its str(), which may not reflect its contents.
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, collections.abc.Mapping):
+        ret = {}
+        for k, v in value.items():
+            if not isinstance(k, str):
+                raise TypeError(
+                    f"Template argument keys must be strings, not {k!r}")
+            ret[k] = _normalize(v)
+        return ret
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(v) for v in value),
+                      key=lambda v: json.dumps(v, sort_keys=True))
+    raise TypeError(
+        f"Unsupported template argument type {type(value).__name__}")
+
+
+def _hash_kwargs(kw):
+    text = json.dumps(_normalize(kw), sort_keys=True)
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+def parse(name, **kw):
+    text = render(name, **kw)
+    return [d for d in yaml.load_all(text, Loader=YAMLLoader)
+            if d is not None]
+
+
+class DocumentCache:
+    """An LRU cache of parsed multi-document templates
+
+    Entries are keyed by the template name and a hash of the render
+    arguments.  Callers always receive deep copies, so they are free
+    to mutate the returned documents.  When several threads miss on
+    the same entry at once, only one renders it and the others wait.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        # key -> Event set once the thread rendering it is done
+        self.pending = {}
+
+    def get(self, name, **kw):
+        key = (name, _hash_kwargs(kw))
+        while True:
+            with self.lock:
+                documents = self.entries.get(key)
+                if documents is not None:
+                    self.entries.move_to_end(key)
+                    return copy.deepcopy(documents)
+                rendering = self.pending.get(key)
+                if rendering is None:
+                    rendering = self.pending[key] = threading.Event()
+                    break
+            # If that render failed, we try it ourselves.
+            rendering.wait()
+        try:
+            documents = parse(name, **kw)
+            with self.lock:
+                self.entries[key] = documents
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.pending[key]
+            rendering.set()
+        return copy.deepcopy(documents)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+document_cache = DocumentCache(DOCUMENT_CACHE_SIZE)
+
+
+def load_documents(name, cache=True, **kw):
+    # Templates rendered with secrets (or anything else used only once)
+    # should not be cached.
+    if not cache:
+        return parse(name, **kw)
+    return document_cache.get(name, **kw)
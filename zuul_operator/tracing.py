@@ -0,0 +1,241 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Trace spans for the phases of each reconcile
+
+Spans are kept in a context variable, so they nest across awaits,
+asyncio tasks and (since utils.run_blocking copies the context)
+blocking calls in the thread pool.  Finished spans are exported in
+batches in the OTLP/JSON format, either appended to a file (one
+export request per line, as read by the OpenTelemetry collector's
+file receiver) or posted to a collector's OTLP/HTTP endpoint.
+
+Tracing is off unless configure() is called; span() is then a no-op.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import requests
+
+log = logging.getLogger("zuul_operator.tracing")
+
+SERVICE_NAME = 'zuul-operator'
+
+# Attributes with this prefix (the Zuul resource being reconciled) are
+# copied to every child span, so that any span can be found by the
+# resource it was for.
+INHERITED_PREFIX = 'zuul.'
+
+# Export whenever this many spans are waiting, or this often.
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL = 5
+
+# OTLP span kind and status codes
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar('zuul_operator_span', default=None)
+_exporter = None
+
+
+def _random_id(size):
+    return os.urandom(size).hex()
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes):
+    return [{'key': k, 'value': _value(v)}
+            for k, v in attributes.items() if v is not None]
+
+
+class Span:
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        if parent:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.attributes = {k: v for k, v in parent.attributes.items()
+                               if k.startswith(INHERITED_PREFIX)}
+        else:
+            self.trace_id = _random_id(16)
+            self.parent_id = None
+            self.attributes = {}
+        self.span_id = _random_id(8)
+        self.attributes.update(attributes)
+        self.error = None
+        self.start = time.time_ns()
+        self.end = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': _attributes(self.attributes),
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.error:
+            span['status'] = {'code': STATUS_ERROR, 'message': self.error}
+        else:
+            span['status'] = {'code': STATUS_OK}
+        return span
+
+
+class Exporter:
+    """Export finished spans in batches from a background thread"""
+
+    def __init__(self, path=None, endpoint=None):
+        self.path = path
+        if endpoint and not endpoint.rstrip('/').endswith('/v1/traces'):
+            endpoint = endpoint.rstrip('/') + '/v1/traces'
+        self.endpoint = endpoint
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name='trace-exporter')
+        self.thread.start()
+
+    def export(self, span):
+        self.queue.put(span)
+        if self.queue.qsize() >= EXPORT_BATCH_SIZE:
+            self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(EXPORT_INTERVAL)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        # Write everything exported so far
+        with self.lock:
+            while True:
+                spans = []
+                while len(spans) < EXPORT_BATCH_SIZE:
+                    try:
+                        spans.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not spans:
+                    return
+                self._write(spans)
+
+    def _write(self, spans):
+        request = {
+            'resourceSpans': [{
+                'resource': {'attributes': _attributes(
+                    {'service.name': SERVICE_NAME})},
+                'scopeSpans': [{
+                    'scope': {'name': 'zuul_operator'},
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }],
+        }
+        data = json.dumps(request, separators=(',', ':'))
+        try:
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(data + '\n')
+            if self.endpoint:
+                r = requests.post(
+                    self.endpoint, data=data, timeout=10,
+                    headers={'Content-Type': 'application/json'})
+                r.raise_for_status()
+        except Exception:
+            log.exception(f"Unable to export {len(spans)} spans")
+
+
+def configure(path=None, endpoint=None):
+    """Start exporting spans to a file and/or an OTLP/HTTP collector"""
+    global _exporter
+    if not (path or endpoint):
+        _exporter = None
+        return
+    _exporter = Exporter(path, endpoint)
+    atexit.register(_exporter.flush)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Run the enclosed code in a new span
+
+    The span is a child of the current span (if any).  Attributes
+    whose value is None are left out.  An exception escaping the span
+    marks it as failed.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+    s = Span(name, _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end = time.time_ns()
+        exporter.export(s)
+
+
+async def traced(name, aw, **attributes):
+    """Await something in a new span"""
+    with span(name, **attributes):
+        return await aw
+
+
+def traced_handler(name, resource):
+    """Run an async kopf handler in a new trace
+
+    The trace is labelled with the namespace and name of the handled
+    object as <resource>.namespace and <resource>.name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kw):
+            with span(name, **{
+                    f'{resource}.namespace': kw.get('namespace'),
+                    f'{resource}.name': kw.get('name')}):
+                return await func(*args, **kw)
+        return wrapper
+    return decorator
@@ -12,67 +12,671 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import hashlib
 import json
 import logging
 import secrets
 import string
+import threading
 import time
 
 import kopf
+import pykube
 import pykube.exceptions
-import yaml
-import jinja2
+from kubernetes.client import ApiClient
 from kubernetes.client import Configuration
 from kubernetes.client.api import core_v1_api
 from kubernetes.stream import stream
 
+from . import informer
+from . import metrics
 from . import objects
+from . import templating
+from . import tracing
+from . import waiter
 
 log = logging.getLogger("zuul_operator.utils")
 
 
+# The maximum number of pooled (keep-alive) connections to the API
+# server shared by all handlers.  This can be changed from the command
+# line with --api-pool-size.
+API_POOL_SIZE = 16
+
+# Rebuild the shared client after this long so that a rotated service
+# account token is picked up.
+API_CLIENT_MAX_AGE = 3600
+
+# The number of threads available for blocking Kubernetes API calls
+# made on behalf of async handlers.  By default this is
+# BLOCKING_WORKERS_PER_RECONCILE for each concurrent reconcile (but at
+# least MIN_BLOCKING_WORKERS); it can be set from the command line
+# with --blocking-workers.
+BLOCKING_WORKERS = None
+BLOCKING_WORKERS_PER_RECONCILE = 4
+MIN_BLOCKING_WORKERS = 32
+
+# Long waits (for clusters to come up, jobs to finish or commands run
+# in pods) each hold a thread for minutes, so they have their own
+# threads, enough for every reconcile to wait for several things at
+# once, and can't starve the API calls of everything else.
+WAIT_WORKERS_PER_RECONCILE = 4
+
+# The number of Zuul resources which may be reconciled at once.  This
+# can be changed from the command line with --max-concurrent-reconciles.
+MAX_CONCURRENT_RECONCILES = 16
+
+_executor = None
+_wait_executor = None
+_api_lock = threading.Lock()
+_api = None
+_api_created = None
+_exec_config = None
+_exec_local = threading.local()
+
+
+def configure_api(pool_size=None):
+    global API_POOL_SIZE, _api, _exec_config
+    with _api_lock:
+        if pool_size is not None:
+            API_POOL_SIZE = pool_size
+        _api = None
+        _exec_config = None
+
+
+def configure_concurrency(max_reconciles=None, blocking_workers=None):
+    global MAX_CONCURRENT_RECONCILES, BLOCKING_WORKERS
+    if max_reconciles is not None:
+        MAX_CONCURRENT_RECONCILES = max_reconciles
+    if blocking_workers is not None:
+        BLOCKING_WORKERS = blocking_workers
+
+
+def _get_executor():
+    global _executor
+    with _api_lock:
+        if _executor is None:
+            workers = BLOCKING_WORKERS or max(
+                MIN_BLOCKING_WORKERS,
+                BLOCKING_WORKERS_PER_RECONCILE * MAX_CONCURRENT_RECONCILES)
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                workers, thread_name_prefix='zuul-operator')
+        return _executor
+
+
+def _get_wait_executor():
+    global _wait_executor
+    with _api_lock:
+        if _wait_executor is None:
+            _wait_executor = concurrent.futures.ThreadPoolExecutor(
+                WAIT_WORKERS_PER_RECONCILE * MAX_CONCURRENT_RECONCILES,
+                thread_name_prefix='zuul-operator-wait')
+        return _wait_executor
+
+
+async def _run_in(executor, func, args, kw):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(ctx.run, func, *args, **kw))
+
+
+async def run_blocking(func, *args, **kw):
+    """Run a blocking function without blocking the event loop
+
+    The function runs in the operator's thread pool with a copy of the
+    caller's context, so kopf's per-handler context (used by
+    kopf.adopt) is still available.
+    """
+    return await _run_in(_get_executor(), func, args, kw)
+
+
+async def run_waiting(func, *args, **kw):
+    """Like run_blocking, for functions which may wait for minutes"""
+    return await _run_in(_get_wait_executor(), func, args, kw)
+
+
+class _InstrumentedAdapter(pykube.http.KubernetesHTTPAdapter):
+    # Record every request made through the pykube client
+    def send(self, request, **kw):
+        start = time.monotonic()
+        status = 'error'
+        try:
+            response = super().send(request, **kw)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe_request(request, status,
+                                    time.monotonic() - start)
+
+
+def get_api():
+    """Return the operator-wide pykube client
+
+    All handlers and helpers should use this rather than creating
+    their own client, so that connections (and TLS sessions) to the
+    API server are reused.
+    """
+    global _api, _api_created
+    with _api_lock:
+        if (_api is None or
+            time.monotonic() - _api_created > API_CLIENT_MAX_AGE):
+            config = pykube.KubeConfig.from_env()
+            adapter = _InstrumentedAdapter(
+                config,
+                pool_connections=API_POOL_SIZE,
+                pool_maxsize=API_POOL_SIZE)
+            _api = pykube.HTTPClient(config, http_adapter=adapter)
+            _api_created = time.monotonic()
+        return _api
+
+
+def get_exec_api():
+    """Return a CoreV1Api suitable for pod exec streams
+
+    The configuration is built once for the whole process.  The stream
+    helper temporarily patches the client it is given, so each thread
+    gets its own client rather than sharing one.
+    """
+    global _exec_config
+    with _api_lock:
+        if _exec_config is None:
+            try:
+                c = Configuration().get_default_copy()
+            except AttributeError:
+                c = Configuration()
+                c.assert_hostname = False
+            c.connection_pool_maxsize = API_POOL_SIZE
+            _exec_config = c
+        config = _exec_config
+    api = getattr(_exec_local, 'api', None)
+    if api is None or api.api_client.configuration is not config:
+        api = core_v1_api.CoreV1Api(ApiClient(config))
+        _exec_local.api = api
+    return api
+
+
 def object_from_dict(data):
     return objects.get_object(data['apiVersion'], data['kind'])
 
 
-def zuul_to_json(x):
-    return json.dumps(x)
+# The field manager used for all server-side apply requests made by
+# the operator.  Keep this stable: changing it would make the API
+# server treat every field we own as belonging to someone else.
+FIELD_MANAGER = 'zuul-operator'
 
+# The field managers of the objects written by older versions of the
+# operator, which created and updated them (as pykube-ng) rather than
+# applying them.
+LEGACY_FIELD_MANAGERS = {'pykube-ng'}
 
-def apply_file(api, fn, **kw):
-    env = jinja2.Environment(
-        loader=jinja2.PackageLoader('zuul_operator', 'templates'))
-    env.filters['zuul_to_json'] = zuul_to_json
-    tmpl = env.get_template(fn)
-    text = tmpl.render(**kw)
-    data = yaml.safe_load_all(text)
+
+class ApplyConflict(Exception):
+    """A server-side apply was rejected because another field manager
+    owns some of the fields we tried to set."""
+
+    def __init__(self, obj, message):
+        self.obj = obj
+        super().__init__(
+            f"Conflict applying {obj.kind} {obj.name}: {message}")
+
+
+def _server_side_apply(obj, force):
+    params = {'fieldManager': FIELD_MANAGER}
+    if force:
+        params['force'] = 'true'
+    r = obj.api.patch(**obj.api_kwargs(
+        headers={'Content-Type': 'application/apply-patch+yaml'},
+        params=params,
+        data=json.dumps(obj.obj)))
+    try:
+        obj.api.raise_for_status(r)
+    except pykube.exceptions.HTTPError as e:
+        if e.code == 409:
+            raise ApplyConflict(obj, str(e))
+        raise
+    obj.set_obj(r.json())
+    _take_over_legacy_fields(obj)
+
+
+def _merge_fields(a, b):
+    # The union of two managedFields fieldsV1 sets
+    ret = dict(a)
+    for k, v in b.items():
+        ret[k] = _merge_fields(ret.get(k, {}), v) if v else ret.get(k, v)
+    return ret
+
+
+def migrate_managed_fields(managed_fields):
+    """Fold the fields set by the legacy managers into our own
+
+    Returns the new managedFields, or None if there is nothing to do.
+    A field set by an older operator with a plain update is co-owned
+    after our first apply, so dropping it from a template would not
+    remove it from the object; owning it outright makes it pruned.
+    """
+    legacy = [f for f in managed_fields
+              if f.get('manager') in LEGACY_FIELD_MANAGERS and
+              f.get('operation') == 'Update' and not f.get('subresource')]
+    ours = [f for f in managed_fields
+            if f.get('manager') == FIELD_MANAGER and
+            f.get('operation') == 'Apply' and not f.get('subresource')]
+    if not legacy or len(ours) != 1:
+        return None
+    merged = dict(ours[0])
+    for entry in legacy:
+        merged['fieldsV1'] = _merge_fields(merged.get('fieldsV1', {}),
+                                           entry.get('fieldsV1', {}))
+    return [merged if f is ours[0] else f
+            for f in managed_fields if not any(f is e for e in legacy)]
+
+
+def _take_over_legacy_fields(obj):
+    # A one-time migration for each object created before we used
+    # server-side apply.
+    metadata = obj.obj['metadata']
+    managed_fields = migrate_managed_fields(
+        metadata.get('managedFields') or [])
+    if managed_fields is None:
+        return
+    r = obj.api.patch(**obj.api_kwargs(
+        headers={'Content-Type': 'application/json-patch+json'},
+        data=json.dumps([
+            {'op': 'test', 'path': '/metadata/resourceVersion',
+             'value': metadata['resourceVersion']},
+            {'op': 'replace', 'path': '/metadata/managedFields',
+             'value': managed_fields},
+        ])))
+    try:
+        obj.api.raise_for_status(r)
+    except pykube.exceptions.HTTPError as e:
+        # Changed since our apply; we'll try again next time it is
+        # applied.
+        log.warning("Unable to take over the fields of %s %s: %s",
+                    obj.kind, obj.name, e)
+        return
+    log.info("Took over the fields of %s %s from %s", obj.kind, obj.name,
+             ', '.join(sorted(LEGACY_FIELD_MANAGERS)))
+    obj.set_obj(r.json())
+
+
+# Every applied object is stamped with a hash of its desired manifest
+# so that unchanged objects can be skipped without a write.
+HASH_ANNOTATION = 'operator.zuul-ci.org/applied-hash'
+
+# How long to trust our own record of what we last applied before
+# applying again.  Changes to objects we watch drop the record at once;
+# any other object deleted or edited behind our back is repaired at
+# most this long after the fact.
+APPLIED_STATE_TTL = 600
+
+
+def document_hash(document):
+    text = json.dumps(document, sort_keys=True)
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+def object_key(obj):
+    return (obj.version, obj.kind, obj.namespace, obj.name)
+
+
+def object_version(obj):
+    # What changes when the desired state of an object (as a dict) is
+    # changed by anyone: the generation where there is one (so that
+    # status updates don't count), otherwise the resourceVersion.
+    metadata = obj['metadata']
+    return metadata.get('generation') or metadata.get('resourceVersion')
+
+
+class AppliedStateCache:
+    """Remember the desired-state hash last seen on each object
+
+    This is populated from the responses to our own applies and from
+    the objects we list or watch, so that a reconcile which changes
+    nothing does not need to talk to the API server at all.  Each
+    entry also records the version of the object it was seen on; a
+    watch event for any other version means someone else changed the
+    object, which is then marked stale until we next apply it.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.stale = set()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            digest, version, expires = entry
+            if time.monotonic() > expires:
+                del self.entries[key]
+                return None
+            return digest
+
+    def set(self, key, digest, version=None):
+        with self.lock:
+            self.entries[key] = (digest, version,
+                                 time.monotonic() + self.ttl)
+            self.stale.discard(key)
+
+    def is_stale(self, key):
+        with self.lock:
+            return key in self.stale
+
+    def observe(self, key, event_type, obj):
+        # Called with each watch event for the object with this key
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if event_type == 'DELETED':
+                self.stale.discard(key)
+            elif entry and entry[1] == object_version(obj):
+                self.entries[key] = entry
+            else:
+                self.stale.add(key)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.stale.discard(key)
+
+    def discard_matching(self, api_version, kind, namespace):
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if key[:3] == (api_version, kind, namespace):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.stale.clear()
+
+
+applied_state = AppliedStateCache(APPLIED_STATE_TTL)
+
+
+# Informer registries (by kind) whose watches keep applied_state
+# current, and whose caches are consulted when it has no entry.
+_applied_state_informers = {}
+
+
+def watch_applied_state(registry):
+    """Keep applied_state current from the watches of an informer registry"""
+    kind = registry.kind
+
+    def listener(event_type, obj, old):
+        metadata = obj['metadata']
+        key = (kind.version, kind.kind, metadata.get('namespace'),
+               metadata['name'])
+        applied_state.observe(key, event_type, obj)
+
+    registry.add_listener(listener)
+    _applied_state_informers[kind] = registry
+
+
+def _cached_live(obj):
+    # The live object from an informer cache, if it is there; this
+    # never reads from the API server.
+    registry = _applied_state_informers.get(type(obj))
+    cache = registry and registry.find(obj.namespace)
+    if cache:
+        return cache.cached(obj.name)
+    return None
+
+
+def apply_object(api, document, force=True):
+    """Create or update an object with a single server-side apply
+
+    The object is skipped entirely if its desired state has not
+    changed since it was last applied.
+    """
+    obj, changed = _apply_object(api, document, force)
+    return obj
+
+
+def _apply_object(api, document, force):
+    metadata = document['metadata']
+    with tracing.span('apply', **{
+            'k8s.kind': document['kind'],
+            'k8s.namespace': metadata.get('namespace'),
+            'k8s.name': metadata.get('name')}) as span:
+        obj, changed = _apply_object_untraced(api, document, force)
+        if span:
+            span.set_attribute('changed', changed)
+        return obj, changed
+
+
+def _apply_object_untraced(api, document, force):
+    digest = document_hash(document)
+    document['metadata'].setdefault('annotations', {})[HASH_ANNOTATION] = \
+        digest
+    obj = object_from_dict(document)(api, document)
+    key = object_key(obj)
+
+    if applied_state.get(key) == digest:
+        return obj, False
+    # Otherwise a single server-side apply is no more expensive than
+    # reading the object back, unless it is watched (and not known to
+    # have been changed by someone else).
+    live = not applied_state.is_stale(key) and _cached_live(obj)
+    if live and live['metadata'].get(
+            'annotations', {}).get(HASH_ANNOTATION) == digest:
+        log.debug("%s %s is unchanged", obj.kind, obj.name)
+        applied_state.set(key, digest, object_version(live))
+        return obj, False
+
+    applied_state.discard(key)
+    try:
+        _server_side_apply(obj, force)
+    except pykube.exceptions.HTTPError as e:
+        if e.code == 422 and isinstance(obj, objects.StatefulSet):
+            log.warning("StatefulSet %s has immutable field changes; "
+                        "deleting and recreating", obj.name)
+            delete_object(obj, propagation_policy="Orphan")
+            waiter.wait_for(
+                api, objects.StatefulSet,
+                f"StatefulSet {obj.name} to be deleted", log,
+                condition=lambda sets: obj.name not in sets,
+                timeout=120,
+                metric_name='statefulset-deletion',
+                namespace=obj.namespace,
+                field_selector={'metadata.name': obj.name})
+            _server_side_apply(obj, force)
+        else:
+            raise
+    applied_state.set(key, digest, object_version(obj.obj))
+    return obj, True
+
+
+def delete_object(obj, propagation_policy=None):
+    applied_state.discard(object_key(obj))
+    obj.delete(propagation_policy=propagation_policy)
+    if isinstance(obj, objects.Secret):
+        cache = secret_informers.find(obj.namespace)
+        if cache:
+            cache.forget(obj.name)
+
+
+def delete_collection(api, kind, namespace, selector,
+                      propagation_policy="Background"):
+    """Delete every object of a kind matching a label selector
+
+    This is a single request however many objects match.  Returns
+    the names of the deleted objects.
+    """
+    query = kind.objects(api).filter(namespace=namespace, selector=selector)
+    kwargs = {
+        'url': query._build_api_url(),
+        'data': json.dumps({'propagationPolicy': propagation_policy}),
+        'version': kind.version,
+    }
+    if kind.base:
+        kwargs['base'] = kind.base
+    if namespace:
+        kwargs['namespace'] = namespace
+    r = api.delete(**kwargs)
+    api.raise_for_status(r)
+    names = [item['metadata']['name']
+             for item in r.json().get('items') or []]
+    cache = None
+    if kind is objects.Secret:
+        cache = secret_informers.find(namespace)
+    for name in names:
+        applied_state.discard((kind.version, kind.kind, namespace, name))
+        if cache:
+            cache.forget(name)
+    return names
+
+
+# Documents in a template are applied in tiers so that the things
+# they depend on exist first.  Kinds not listed here (custom resources,
+# webhook configurations, PodDisruptionBudgets, etc.) are applied in a
+# final tier after everything else.
+APPLY_TIERS = [
+    ('CustomResourceDefinition', 'Namespace'),
+    ('ServiceAccount', 'Role', 'ClusterRole', 'RoleBinding',
+     'ClusterRoleBinding', 'ConfigMap', 'Secret'),
+    ('Service',),
+    ('Deployment', 'StatefulSet', 'DaemonSet', 'Job'),
+]
+
+# The maximum number of documents within a tier to apply at once.
+APPLY_WORKERS = 8
+
+# How long to wait for a newly applied CRD to be established.
+CRD_ESTABLISHED_TIMEOUT = 120
+
+
+def _apply_tier(document):
+    for i, kinds in enumerate(APPLY_TIERS):
+        if document['kind'] in kinds:
+            return i
+    return len(APPLY_TIERS)
+
+
+def _crd_established(crd):
+    for condition in crd.get('status', {}).get('conditions', []):
+        if (condition['type'] == 'Established' and
+            condition['status'] == 'True'):
+            return True
+    return False
+
+
+def wait_for_crds(crds):
+    deadline = time.monotonic() + CRD_ESTABLISHED_TIMEOUT
+    for crd in crds:
+        if _crd_established(crd.obj):
+            continue
+        waiter.wait_for(
+            crd.api, objects.CustomResourceDefinition,
+            f"CRD {crd.name} to be established", log,
+            condition=lambda crds: _crd_established(
+                crds.get(crd.name, {})),
+            timeout=max(deadline - time.monotonic(), 1),
+            metric_name='crd',
+            field_selector={'metadata.name': crd.name})
+
+
+def seed_applied_state(objs):
+    """Record the desired-state hashes of objects we have just listed
+
+    This lets a following apply of many objects skip the unchanged
+    ones without reading each of them back first.
+    """
+    for obj in objs:
+        digest = obj.annotations.get(HASH_ANNOTATION)
+        if digest:
+            applied_state.set(object_key(obj), digest,
+                              object_version(obj.obj))
+
+
+def _observe_secret(obj):
+    # Make sure the next get_secret() sees what we just wrote.
+    cache = secret_informers.find(obj.namespace)
+    if cache:
+        cache.observe(obj.obj)
+
+
+def apply_documents(api, documents, force=True):
+    tiers = {}
+    for document in documents:
+        tiers.setdefault(_apply_tier(document), []).append(document)
+
+    for tier in sorted(tiers.keys()):
+        documents = tiers[tier]
+        if len(documents) == 1:
+            applied = [_apply_object(api, documents[0], force)]
+        else:
+            workers = min(APPLY_WORKERS, len(documents))
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                # Each in a copy of our context, so that its span is
+                # a child of ours.
+                futures = [executor.submit(
+                    contextvars.copy_context().run,
+                    _apply_object, api, d, force)
+                    for d in documents]
+            # Raise the first error (if any) only after the whole tier
+            # has finished.
+            applied = [f.result() for f in futures]
+        for obj, changed in applied:
+            metrics.APPLIED_OBJECTS.labels(
+                obj.kind, changed and 'applied' or 'unchanged').inc()
+            if changed and isinstance(obj, objects.Secret):
+                _observe_secret(obj)
+        # Only CRDs we actually wrote can still be pending.
+        crds = [obj for (obj, changed) in applied
+                if changed and
+                isinstance(obj, objects.CustomResourceDefinition)]
+        if crds:
+            wait_for_crds(crds)
+
+
+# The owner of the objects applied outside of a kopf handler for it;
+# see owned_by().
+_owner = contextvars.ContextVar('zuul_operator_owner', default=None)
+
+
+@contextlib.contextmanager
+def owned_by(body):
+    """Adopt the objects applied in the enclosed code to an owner
+
+    Within a kopf handler, objects are otherwise adopted by the
+    object being handled.
+    """
+    token = _owner.set(body)
+    try:
+        yield
+    finally:
+        _owner.reset(token)
+
+
+def load_file(fn, **kw):
+    # Options for this function are prefixed with an underscore;
+    # everything else is passed to the template.
+    template_kw = {k: v for k, v in kw.items() if not k.startswith('_')}
+    data = templating.load_documents(fn, cache=kw.get('_cache', True),
+                                     **template_kw)
     namespace = kw.get('namespace')
     for document in data:
         if namespace:
             document['metadata']['namespace'] = namespace
         if kw.get('_adopt', True):
-            kopf.adopt(document)
-        obj = object_from_dict(document)(api, document)
-        if not obj.exists():
-            obj.create()
-        else:
-            try:
-                obj.update()
-            except pykube.exceptions.HTTPError as e:
-                if e.code == 422 and isinstance(obj, objects.StatefulSet):
-                    log.warning("StatefulSet %s has immutable field changes; "
-                                "deleting and recreating", obj.name)
-                    obj.delete(propagation_policy="Orphan")
-                    deadline = time.monotonic() + 120
-                    while obj.exists():
-                        if time.monotonic() > deadline:
-                            raise Exception(
-                                f"Timed out waiting for StatefulSet "
-                                f"{obj.name} to be deleted")
-                        time.sleep(2)
-                    obj.create()
-                else:
-                    raise
+            kopf.adopt(document, owner=_owner.get())
+    return data
+
+
+def apply_file(api, fn, **kw):
+    with metrics.APPLY_FILE_DURATION.labels(fn).time(), \
+         tracing.span('apply_file', template=fn):
+        data = load_file(fn, **kw)
+        apply_documents(api, data, force=kw.get('_force', True))
 
 
 def generate_password(length=32):
@@ -80,8 +684,9 @@ def generate_password(length=32):
     return ''.join(secrets.choice(alphabet) for i in range(length))
 
 
-def make_secret(namespace, name, string_data):
-    return {
+def make_secret(namespace, name, string_data, labels=None,
+                annotations=None):
+    secret = {
         'apiVersion': 'v1',
         'kind': 'Secret',
         'metadata': {
@@ -90,30 +695,81 @@ def make_secret(namespace, name, string_data):
         },
         'stringData': string_data
     }
+    labels = dict(labels or {}, **SECRET_LABELS)
+    if labels:
+        secret['metadata']['labels'] = labels
+    if annotations:
+        secret['metadata']['annotations'] = dict(annotations)
+    return secret
+
+
+# Secrets are read through a per-namespace watch-backed cache rather
+# than with a GET each time.  With SECRET_LABELS, only the Secrets
+# with those labels are watched (and the operator puts them on the
+# Secrets it writes); any other Secret is read with a GET.
+SECRET_LABELS = {}
+secret_informers = informer.InformerRegistry(get_api, objects.Secret)
+watch_applied_state(secret_informers)
+
+
+def configure_secret_watch(labels=None):
+    global SECRET_LABELS, secret_informers
+    secret_informers.stop()
+    SECRET_LABELS = dict(labels or {})
+    secret_informers = informer.InformerRegistry(
+        get_api, objects.Secret, SECRET_LABELS or None)
+    watch_applied_state(secret_informers)
+
+
+def get_secret(api, namespace, name):
+    """Return a Secret from the cache
+
+    Raises ObjectDoesNotExist if there is no such Secret.
+    """
+    obj = secret_informers.get(namespace).get(name)
+    return objects.Secret(api, obj)
 
 
 def update_secret(api, namespace, name, string_data):
     obj = make_secret(namespace, name, string_data)
-    secret = objects.Secret(api, obj)
-    if secret.exists():
-        secret.update()
-    else:
-        secret.create()
+    obj, changed = _apply_object(api, obj, True)
+    if changed:
+        _observe_secret(obj)
+
+
+# The longest we wait for a command which is given input on stdin.
+POD_EXEC_TIMEOUT = 300
+
+
+def pod_exec(namespace, name, command, stdin=None):
+    with tracing.span('pod_exec', **{'k8s.namespace': namespace,
+                                     'k8s.pod.name': name,
+                                     'command': command[0]}):
+        return _pod_exec(namespace, name, command, stdin)
 
 
-def pod_exec(namespace, name, command):
+def _pod_exec(namespace, name, command, stdin):
+    api = get_exec_api()
+    if stdin is None:
+        resp = stream(api.connect_get_namespaced_pod_exec,
+                      name,
+                      namespace,
+                      command=command,
+                      stderr=True, stdin=False,
+                      stdout=True, tty=False)
+        return resp
+    # The exec protocol has no way to close stdin, so the command
+    # must know how much input to read.
+    client = stream(api.connect_get_namespaced_pod_exec,
+                    name,
+                    namespace,
+                    command=command,
+                    stderr=True, stdin=True,
+                    stdout=True, tty=False,
+                    _preload_content=False)
     try:
-        c = Configuration().get_default_copy()
-    except AttributeError:
-        c = Configuration()
-        c.assert_hostname = False
-    Configuration.set_default(c)
-    api = core_v1_api.CoreV1Api()
-
-    resp = stream(api.connect_get_namespaced_pod_exec,
-                  name,
-                  namespace,
-                  command=command,
-                  stderr=True, stdin=False,
-                  stdout=True, tty=False)
-    return resp
+        client.write_stdin(stdin)
+        client.run_forever(timeout=POD_EXEC_TIMEOUT)
+        return client.read_stdout() + client.read_stderr()
+    finally:
+        client.close()
@@ -0,0 +1,198 @@
+# Copyright 2026 Acme Gating, LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import time
+
+import kopf
+import pykube.exceptions
+import requests
+
+from . import metrics
+from . import tracing
+
+# The longest we ask the API server to keep a single watch open; the
+# watch is resumed from the last seen resourceVersion after this.
+WATCH_TIMEOUT = 60
+
+# Log progress at least this often, even if it has not changed.
+PROGRESS_INTERVAL = 30
+
+# How long to back off after the watch connection fails.
+ERROR_DELAY = 2
+
+
+class WaitTimeout(kopf.TemporaryError):
+    pass
+
+
+class _Expired(Exception):
+    pass
+
+
+def _list(query):
+    data = query.execute().json()
+    objs = {}
+    for item in data.get('items') or []:
+        objs[item['metadata']['name']] = item
+    return objs, data['metadata']['resourceVersion']
+
+
+def _watch(query, resource_version, timeout):
+    params = {
+        'watch': 'true',
+        'allowWatchBookmarks': 'true',
+        'resourceVersion': resource_version,
+        'timeoutSeconds': str(timeout),
+    }
+    kwargs = {
+        'url': query._build_api_url(params=params),
+        'stream': True,
+        # Give the server a chance to end the watch itself before the
+        # read times out.
+        'timeout': (10, timeout + 10),
+    }
+    if query.api_obj_class.base:
+        kwargs['base'] = query.api_obj_class.base
+    if query.api_obj_class.version:
+        kwargs['version'] = query.api_obj_class.version
+    if query.namespace:
+        kwargs['namespace'] = query.namespace
+    r = query.api.get(**kwargs)
+    query.api.raise_for_status(r)
+    try:
+        for line in r.iter_lines():
+            if line:
+                yield json.loads(line.decode('utf8'))
+    finally:
+        r.close()
+
+
+class Waiter:
+    """Wait for a condition on a set of Kubernetes objects
+
+    The objects are those matching a query (kind, namespace and label
+    or field selectors).  They are listed once, and then kept up to
+    date with a watch which is resumed from the last seen
+    resourceVersion, so the condition is re-checked as soon as
+    anything changes rather than on a fixed polling interval.
+
+    The condition is called with a dictionary of object name to
+    object (as a dict) and should return a true value once it is
+    satisfied; that value is returned from wait().  An optional
+    progress function, called the same way, returns a string to be
+    logged as the wait proceeds.
+
+    The time spent waiting is recorded in the wait duration metric
+    under metric_name (by default, the kind of object).
+    """
+
+    def __init__(self, api, kind, description, log, namespace=None,
+                 selector=None, field_selector=None, metric_name=None):
+        self.description = description
+        self.metric_name = metric_name or kind.kind.lower()
+        self.log = log
+        self.query = kind.objects(api).filter(
+            namespace=namespace, selector=selector,
+            field_selector=field_selector)
+        self._last_progress = None
+        self._last_progress_time = 0
+
+    def _report(self, progress, objs):
+        if progress is None:
+            return
+        message = progress(objs)
+        now = time.monotonic()
+        if (message != self._last_progress or
+            now - self._last_progress_time > PROGRESS_INTERVAL):
+            self.log.info(f"Waiting for {self.description}: {message}")
+            self._last_progress = message
+            self._last_progress_time = now
+
+    def wait(self, condition, timeout, progress=None):
+        start = time.monotonic()
+        outcome = 'error'
+        try:
+            with tracing.span('wait', wait=self.metric_name):
+                result = self._wait(condition, timeout, progress)
+            outcome = 'success'
+            return result
+        except WaitTimeout:
+            outcome = 'timeout'
+            raise
+        finally:
+            metrics.WAIT_DURATION.labels(
+                self.metric_name, outcome).observe(
+                    time.monotonic() - start)
+
+    def _wait(self, condition, timeout, progress):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                objs, resource_version = _list(self.query)
+                result = condition(objs)
+                if result:
+                    return result
+                self._report(progress, objs)
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    for event in _watch(self.query, resource_version,
+                                        min(int(remaining) + 1,
+                                            WATCH_TIMEOUT)):
+                        obj = event['object']
+                        if event['type'] == 'ERROR':
+                            # Most likely 410 Gone: our resourceVersion
+                            # is too old and we need to list again.
+                            raise _Expired(obj.get('message'))
+                        resource_version = \
+                            obj['metadata']['resourceVersion']
+                        if event['type'] == 'BOOKMARK':
+                            continue
+                        name = obj['metadata']['name']
+                        if event['type'] == 'DELETED':
+                            objs.pop(name, None)
+                        else:
+                            objs[name] = obj
+                        result = condition(objs)
+                        if result:
+                            return result
+                        self._report(progress, objs)
+            except _Expired as e:
+                self.log.debug(f"Watch for {self.description} expired: {e}")
+                continue
+            except pykube.exceptions.HTTPError as e:
+                if e.code != 410:
+                    raise
+                continue
+            except requests.exceptions.RequestException as e:
+                self.log.warning(
+                    f"Error watching {self.description}: {e}")
+                time.sleep(ERROR_DELAY)
+            if time.monotonic() >= deadline:
+                raise WaitTimeout(
+                    f"Timed out after {timeout} seconds waiting for "
+                    f"{self.description}")
+
+
+def wait_for(api, kind, description, log, condition, timeout,
+             progress=None, **query):
+    return Waiter(api, kind, description, log, **query).wait(
+        condition, timeout, progress)
+
+
+def count_running(pods):
+    return len([p for p in pods.values()
+                if p.get('status', {}).get('phase') == 'Running'])
@@ -12,35 +12,35 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import time
-
 from . import objects
 from . import utils
+from . import waiter
 
 
 class ZooKeeper:
+    # How long to wait for the cluster to start before retrying.
+    wait_timeout = 1800
+
     def __init__(self, api, namespace, logger, spec):
         self.api = api
         self.namespace = namespace
         self.log = logger
         self.spec = spec
 
-    def create(self):
-        utils.apply_file(self.api, 'zookeeper.yaml',
-                         namespace=self.namespace, spec=self.spec)
+    async def create(self):
+        await utils.run_blocking(
+            utils.apply_file, self.api, 'zookeeper.yaml',
+            namespace=self.namespace, spec=self.spec)
 
-    def wait_for_cluster(self):
-        while True:
-            count = 0
-            for obj in objects.Pod.objects(self.api).filter(
-                    namespace=self.namespace,
-                    selector={'app': 'zookeeper',
-                              'component': 'server'}):
-                if obj.obj['status']['phase'] == 'Running':
-                    count += 1
-            if count == 3:
-                self.log.info("ZK cluster is running")
-                return
-            else:
-                self.log.info(f"Waiting for ZK cluster: {count}/3")
-                time.sleep(10)
+    async def wait_for_cluster(self):
+        await utils.run_waiting(
+            waiter.wait_for,
+            self.api, objects.Pod, 'ZK cluster', self.log,
+            condition=lambda pods: waiter.count_running(pods) == 3,
+            progress=lambda pods: f"{waiter.count_running(pods)}/3",
+            timeout=self.wait_timeout,
+            metric_name='zookeeper',
+            namespace=self.namespace,
+            selector={'app': 'zookeeper',
+                      'component': 'server'})
+        self.log.info("ZK cluster is running")
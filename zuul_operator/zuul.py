@@ -12,31 +12,107 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import asyncio
 import kopf
 import copy
 import base64
+import configparser
+import datetime
 import hashlib
+import json
+import os
 import time
 
-import jinja2
 import pykube
 import yaml
 
 from . import objects
 from . import utils
+from . import metrics
 from . import certmanager
+from . import planner
 from . import pxc
+from . import templating
+from . import tracing
+from . import waiter
 from . import zookeeper
 
+# Settings in the spec sections which are written to zuul.conf that
+# are used by the operator rather than Zuul.
+OPERATOR_KEYS = {
+    'allowUnsafeConfig',
+    'config',
+    'count',
+    'secretName',
+    'sshkey',
+    'storageClassName',
+    'storageSize',
+    'terminationGracePeriodSeconds',
+}
+
+# The zuul.conf sections read by each component.  A component is only
+# restarted when one of these changes.  Connection and auth sections
+# are matched by type ("connection" covers every connection).
+COMPONENT_CONF_SECTIONS = {
+    'zuul-scheduler': {'keystore', 'zookeeper', 'scheduler', 'database',
+                       'web', 'connection', 'auth'},
+    'zuul-web': {'keystore', 'zookeeper', 'scheduler', 'database', 'web',
+                 'connection', 'auth'},
+    'zuul-fingergw': {'keystore', 'zookeeper', 'fingergw'},
+    'zuul-executor': {'keystore', 'zookeeper', 'executor', 'merger',
+                      'connection'},
+    'zuul-merger': {'keystore', 'zookeeper', 'merger', 'connection'},
+    'zuul-launcher': {'keystore', 'zookeeper', 'launcher', 'connection'},
+}
+
+
+def conf_shas(text):
+    # Return the sha of the relevant parts of zuul.conf for each
+    # component.
+    parser = configparser.RawConfigParser(strict=False)
+    try:
+        parser.read_string(text)
+    except configparser.Error:
+        # We can't tell which parts changed, so everything uses the
+        # whole file.
+        sha = hashlib.sha256(text.encode('utf8')).hexdigest()
+        return {component: sha for component in COMPONENT_CONF_SECTIONS}
+    shas = {}
+    for component, types in COMPONENT_CONF_SECTIONS.items():
+        sections = {
+            section: dict(parser.items(section))
+            for section in parser.sections()
+            if section.split(' ', 1)[0] in types}
+        text = json.dumps(sections, sort_keys=True)
+        shas[component] = hashlib.sha256(text.encode('utf8')).hexdigest()
+    return shas
+
+
+# Completed install steps are checkpointed in the status at most this
+# often (in seconds), so a quick install writes no checkpoints at all.
+CHECKPOINT_INTERVAL = 10
+
+
+NODEPOOL_PROVIDER_LABEL = 'operator.zuul-ci.org/nodepool-provider'
+
+# An annotation on each nodepool provider config secret with the hash
+# of its contents.
+NODEPOOL_CONFIG_SHA = 'operator.zuul-ci.org/nodepool-config-sha'
+
 
 class Zuul:
     def __init__(self, namespace, name, logger, spec):
-        self.api = pykube.HTTPClient(pykube.KubeConfig.from_env())
+        self.api = utils.get_api()
         self.namespace = namespace
         self.name = name
         self.log = logger
         self.spec = copy.deepcopy(dict(spec))
-        self.zuul_conf_sha = None
+        self.zuul_conf_shas = None
+        self.keystore_password = None
+        self.registry_conf_written = False
+        # Set once the nodepool config has been sharded (provider name
+        # -> secret name).
+        self.nodepool_provider_secrets = None
 
         db_secret = spec.get('database', {}).get('secretName')
         if db_secret:
@@ -72,9 +148,18 @@ class Zuul:
 
         self.tenant_secret = spec.get('scheduler', {}).\
             get('config', {}).get('secretName')
+        # Whether the operator writes the tenant config into the
+        # schedulers itself rather than waiting for the kubelet to
+        # update the mounted secret.
+        self.push_tenant_config = bool(spec.get('scheduler', {}).
+                                       get('config', {}).get('push'))
+        if self.push_tenant_config:
+            self.tenant_config_path = '/etc/zuul/tenant-pushed/main.yaml'
+        else:
+            self.tenant_config_path = '/etc/zuul/tenant/main.yaml'
 
         self.spec.setdefault('scheduler', {})['tenant_config'] = \
-            '/etc/zuul/tenant/main.yaml'
+            self.tenant_config_path
         self.spec.setdefault('scheduler', {}).setdefault(
             'storageClassName', '')
         self.spec.setdefault('executor', {}).setdefault('count', 1)
@@ -123,39 +208,97 @@ class Zuul:
         self.cert_manager = certmanager.CertManager(
             self.api, self.namespace, self.log)
         self.installing_cert_manager = False
+        # Checkpoints not yet written to the status, and whether any
+        # have been.
+        self.pending_checkpoints = {}
+        self.checkpoints_written = time.monotonic()
+        self.checkpointed = False
+        self.pxc = pxc.PXC(self.api, self.namespace, self.log)
+        self.zk = zookeeper.ZooKeeper(self.api, self.namespace, self.log,
+                                      self.spec['zookeeper'])
+
+    def checkpoint_inputs(self):
+        # Everything the outcome of each checkpointed install step
+        # depends on: the relevant part of the spec and the templates
+        # it applies (so that an operator upgrade redoes the step).
+        database = {
+            'manage': self.manage_db,
+            'spec': self.spec.get('database', {}),
+            'templates': templating.source_hash(
+                'pxc-bundle.yaml', 'pxc-cluster.yaml', 'pxc-create-db.yaml'),
+        }
+        cert_manager = {
+            'templates': templating.source_hash(
+                'cert-manager.yaml', 'cert-authority.yaml'),
+        }
+        zookeeper = {
+            'manage': self.manage_zk,
+            'spec': self.spec['zookeeper'],
+            'templates': templating.source_hash('zookeeper.yaml'),
+        }
+        return {
+            'install_db': database,
+            'wait_for_db': database,
+            'install_cert_manager': cert_manager,
+            'wait_for_cert_manager': cert_manager,
+            'create_cert_manager_ca': cert_manager,
+            'install_zk': zookeeper,
+            'wait_for_zk': zookeeper,
+        }
 
-    def install_cert_manager(self):
-        if self.cert_manager.is_installed():
+    async def save_checkpoint(self, step, digest):
+        self.pending_checkpoints[step] = digest
+        if time.monotonic() - self.checkpoints_written >= CHECKPOINT_INTERVAL:
+            await self.write_checkpoints()
+
+    async def write_checkpoints(self):
+        if not self.pending_checkpoints:
+            return
+        checkpoints = self.pending_checkpoints
+        self.pending_checkpoints = {}
+        # A merge patch, so a digest of None removes the checkpoint
+        await utils.run_blocking(
+            self.update_status, {'checkpoints': checkpoints})
+        self.checkpoints_written = time.monotonic()
+        self.checkpointed = True
+
+    async def clear_checkpoints(self):
+        # Once the install has completed there is nothing to resume.
+        self.pending_checkpoints = {}
+        await utils.run_blocking(
+            self.update_status, {'checkpoints': None})
+        self.checkpointed = False
+
+    async def install_cert_manager(self):
+        if await utils.run_blocking(self.cert_manager.is_installed):
             return
         self.installing_cert_manager = True
-        self.cert_manager.install()
+        await self.cert_manager.install()
 
-    def wait_for_cert_manager(self):
+    async def wait_for_cert_manager(self):
         if not self.installing_cert_manager:
             return
         self.log.info("Waiting for Cert-Manager")
-        self.cert_manager.wait_for_webhook()
+        await self.cert_manager.wait_for_webhook()
 
-    def create_cert_manager_ca(self):
-        self.cert_manager.create_ca()
+    async def create_cert_manager_ca(self):
+        await self.cert_manager.create_ca()
 
-    def install_zk(self):
+    async def install_zk(self):
         if not self.manage_zk:
             self.log.info("ZK is externally managed")
             return
-        self.zk = zookeeper.ZooKeeper(self.api, self.namespace, self.log,
-                                      self.spec['zookeeper'])
-        self.zk.create()
+        await self.zk.create()
 
-    def wait_for_zk(self):
+    async def wait_for_zk(self):
         if not self.manage_zk:
             return
         self.log.info("Waiting for ZK cluster")
-        self.zk.wait_for_cluster()
+        await self.zk.wait_for_cluster()
 
     # A two-part process for PXC so that this can run while other
     # installations are happening.
-    def install_db(self):
+    async def install_db(self):
         if not self.manage_db:
             self.log.info("DB is externally managed")
             return
@@ -163,51 +306,54 @@ class Zuul:
         small = self.spec.get('database', {}).get('allowUnsafeConfig', False)
 
         self.log.info("DB is internally managed")
-        self.pxc = pxc.PXC(self.api, self.namespace, self.log)
-        if not self.pxc.is_installed():
+        if not await utils.run_blocking(self.pxc.is_installed):
             self.log.info("Installing PXC operator")
-            self.pxc.create_operator()
+            await self.pxc.create_operator()
 
         self.log.info("Creating PXC cluster")
-        self.pxc.create_cluster(small)
+        await self.pxc.create_cluster(small)
 
-    def wait_for_db(self):
+    async def wait_for_db(self):
         if not self.manage_db:
             return
         self.log.info("Waiting for PXC cluster")
-        self.pxc.wait_for_cluster()
+        await self.pxc.wait_for_cluster()
 
-        dburi = self.get_db_uri()
+        dburi = await utils.run_blocking(self.get_db_uri)
         if not dburi:
             self.log.info("Creating database")
-            self.pxc.create_database()
+            await self.pxc.create_database()
 
     def get_db_uri(self):
         try:
-            obj = objects.Secret.objects(self.api).\
-                filter(namespace=self.namespace).\
-                get(name=self.db_secret)
+            obj = utils.get_secret(self.api, self.namespace, self.db_secret)
             uri = base64.b64decode(obj.obj['data']['dburi']).decode('utf8')
             return uri
         except pykube.exceptions.ObjectDoesNotExist:
             return None
 
     def get_keystore_password(self):
+        if self.keystore_password:
+            return self.keystore_password
         secret_name = 'zuul-keystore'
         secret_key = 'password'
         try:
-            obj = objects.Secret.objects(self.api).\
-                filter(namespace=self.namespace).\
-                get(name=secret_name)
+            obj = utils.get_secret(self.api, self.namespace, secret_name)
             pw = base64.b64decode(obj.obj['data'][secret_key]).decode('utf8')
-            return pw
         except pykube.exceptions.ObjectDoesNotExist:
             pw = utils.generate_password(512)
             utils.update_secret(self.api, self.namespace, secret_name,
                                 string_data={secret_key: pw})
-            return pw
+        self.keystore_password = pw
+        return pw
+
+    async def prepare_keystore(self):
+        await utils.run_blocking(self.get_keystore_password)
+
+    async def write_zuul_conf(self):
+        await utils.run_blocking(self._write_zuul_conf)
 
-    def write_zuul_conf(self):
+    def _write_zuul_conf(self):
         dburi = self.get_db_uri()
         self.spec.setdefault('database', {})['dburi'] = dburi
 
@@ -224,9 +370,8 @@ class Zuul:
         # Copy in any information from connection secrets
         for connection_name, connection in connections.items():
             if 'secretName' in connection:
-                obj = objects.Secret.objects(self.api).\
-                    filter(namespace=self.namespace).\
-                    get(name=connection['secretName'])
+                obj = utils.get_secret(self.api, self.namespace,
+                                       connection['secretName'])
                 for k, v in obj.obj['data'].items():
                     if k in ('sshkey', 'app_key'):
                         v = f'/etc/zuul/connections/{connection_name}/{k}'
@@ -240,9 +385,8 @@ class Zuul:
         # Copy in any information from auth secrets
         for auth_name, auth_config in auth.items():
             if 'secretName' in auth_config:
-                obj = objects.Secret.objects(self.api).\
-                    filter(namespace=self.namespace).\
-                    get(name=auth_config['secretName'])
+                obj = utils.get_secret(self.api, self.namespace,
+                                       auth_config['secretName'])
                 for k, v in obj.obj['data'].items():
                     auth_config[k] = base64.b64decode(v).decode('utf-8')
                 del auth_config['secretName']
@@ -250,23 +394,30 @@ class Zuul:
         kw = {'auth': auth,
               'connections': connections,
               'spec': self.spec,
+              'operator_keys': OPERATOR_KEYS,
               'keystore_password': self.get_keystore_password()}
 
-        env = jinja2.Environment(
-            loader=jinja2.PackageLoader('zuul_operator', 'templates'))
-        tmpl = env.get_template('zuul.conf')
-        text = tmpl.render(**kw)
-
-        # Create a sha of the zuul.conf so that we can set it as an
-        # annotation on objects which should be recreated when it
-        # changes.
-        m = hashlib.sha256()
-        m.update(text.encode('utf8'))
-        self.zuul_conf_sha = m.hexdigest()
+        text = templating.render('zuul.conf', **kw)
+        self.set_zuul_conf_shas(text)
 
         utils.update_secret(self.api, self.namespace, 'zuul-config',
                             string_data={'zuul.conf': text})
 
+    def set_zuul_conf_shas(self, text):
+        # Create a sha of the parts of zuul.conf used by each
+        # component so that we can set it as an annotation on objects
+        # which should be recreated when they change.
+        self.zuul_conf_shas = conf_shas(text)
+
+    def load_zuul_conf_shas(self):
+        # Use the existing zuul.conf when it is not being rewritten
+        try:
+            obj = utils.get_secret(self.api, self.namespace, 'zuul-config')
+        except pykube.exceptions.ObjectDoesNotExist:
+            raise kopf.TemporaryError("Zuul config secret not found")
+        text = base64.b64decode(obj.obj['data']['zuul.conf']).decode('utf8')
+        self.set_zuul_conf_shas(text)
+
     def parse_zk_string(self, hosts):
         if '/' in hosts:
             hosts, chroot = hosts.split('/', 1)
@@ -283,17 +434,32 @@ class Zuul:
             ret.append(server)
         return ret
 
+    def nodepool_labels(self, provider_name=None):
+        # The labels on every object belonging to a nodepool provider
+        labels = {
+            'app.kubernetes.io/name': 'nodepool',
+            'app.kubernetes.io/instance': self.name,
+            'app.kubernetes.io/part-of': 'zuul',
+            'app.kubernetes.io/component': 'nodepool-launcher',
+        }
+        if provider_name:
+            labels[NODEPOOL_PROVIDER_LABEL] = provider_name
+        return labels
+
     def write_nodepool_conf(self):
-        self.nodepool_provider_secrets = {}
+        # Sets nodepool_provider_secrets, unless the config can not be
+        # read; it is then left as None so that the existing launchers
+        # are left alone.
+        self.nodepool_provider_secrets = None
         # load nodepool config
 
         if not self.nodepool_secret:
             self.log.warning("No nodepool config secret found")
+            return None
 
         try:
-            obj = objects.Secret.objects(self.api).\
-                filter(namespace=self.namespace).\
-                get(name=self.nodepool_secret)
+            obj = utils.get_secret(self.api, self.namespace,
+                                   self.nodepool_secret)
         except pykube.exceptions.ObjectDoesNotExist:
             self.log.error("Nodepool config secret not found")
             return None
@@ -310,24 +476,59 @@ class Zuul:
             'key': '/tls/client/tls.key',
             'ca': '/tls/client/ca.crt',
         }
+        # Only write the shards which have changed since last time.
+        existing = utils.secret_informers.get(self.namespace).items()
+        provider_secrets = {}
+        documents = []
         for provider in nodepool_yaml['providers']:
-            self.log.info("Configuring provider %s", provider.get('name'))
-
             secret_name = f"nodepool-config-{self.name}-{provider['name']}"
+            provider_secrets[provider['name']] = secret_name
 
             provider_yaml = nodepool_yaml.copy()
             provider_yaml['providers'] = [provider]
 
             text = yaml.dump(provider_yaml)
-            utils.update_secret(self.api, self.namespace, secret_name,
-                                string_data={'nodepool.yaml': text})
-            self.nodepool_provider_secrets[provider['name']] = secret_name
+            sha = hashlib.sha256(text.encode('utf8')).hexdigest()
+            live = existing.get(secret_name, {}).get('metadata', {})
+            if live.get('annotations', {}).get(NODEPOOL_CONFIG_SHA) == sha:
+                continue
 
-    def create_nodepool(self):
-        # Create secrets
-        self.write_nodepool_conf()
+            self.log.info("Configuring provider %s", provider.get('name'))
+            documents.append(utils.make_secret(
+                self.namespace, secret_name,
+                string_data={'nodepool.yaml': text},
+                labels=self.nodepool_labels(provider['name']),
+                annotations={NODEPOOL_CONFIG_SHA: sha}))
+        utils.apply_documents(self.api, documents)
+        self.nodepool_provider_secrets = provider_secrets
+
+    async def prepare_nodepool(self):
+        if self.spec['launcher']['type'] in ('nodepool', 'both'):
+            await utils.run_blocking(self.write_nodepool_conf)
+
+    async def create_nodepool(self):
+        await utils.run_blocking(self._create_nodepool)
+
+    def _create_nodepool(self):
+        # Create secrets (unless that has already been done for this
+        # reconcile)
+        if self.nodepool_provider_secrets is None:
+            self.write_nodepool_conf()
+        if self.nodepool_provider_secrets is None:
+            # Without the config we can't tell which launchers are
+            # still wanted, so none are created or deleted.
+            return
+
+        # Get current providers
+        providers = list(objects.Deployment.objects(self.api).filter(
+            namespace=self.namespace,
+            selector=self.nodepool_labels()))
+        # Launchers which are already up to date are skipped without
+        # reading them back individually.
+        utils.seed_applied_state(providers)
 
         # Create providers
+        documents = []
         for provider_name, secret_name in\
             self.nodepool_provider_secrets.items():
             kw = {
@@ -337,52 +538,92 @@ class Zuul:
                 'external_config': self.spec.get('externalConfig', {}),
                 'spec': self.spec,
             }
-            utils.apply_file(self.api, 'nodepool-launcher.yaml',
-                             namespace=self.namespace, **kw)
-
-        # Get current providers
-        providers = objects.Deployment.objects(self.api).filter(
-            namespace=self.namespace,
-            selector={'app.kubernetes.io/instance': self.name,
-                      'app.kubernetes.io/component': 'nodepool-launcher',
-                      'app.kubernetes.io/name': 'nodepool',
-                      'app.kubernetes.io/part-of': 'zuul'})
+            documents.extend(utils.load_file(
+                'nodepool-launcher.yaml', namespace=self.namespace, **kw))
+        utils.apply_documents(self.api, documents)
 
         new_providers = set(self.nodepool_provider_secrets.keys())
-        old_providers = set([x.labels['operator.zuul-ci.org/nodepool-provider']
+        old_providers = set([x.labels[NODEPOOL_PROVIDER_LABEL]
                              for x in providers])
-        # delete any unecessary provider deployments and secrets
-        for unused_provider in old_providers - new_providers:
-            self.log.info("Deleting unused provider %s", unused_provider)
-
-            deployment_name = "nodepool-launcher-"\
-                f"{self.name}-{unused_provider}"
-            secret_name = f"nodepool-config-{self.name}-{unused_provider}"
-
-            try:
-                obj = objects.Deployment.objects(self.api).filter(
-                    namespace=self.namespace).get(deployment_name)
-                obj.delete()
-            except pykube.exceptions.ObjectDoesNotExist:
-                pass
-
-            try:
-                obj = objects.Secret.objects(self.api).filter(
-                    namespace=self.namespace).get(secret_name)
-                obj.delete()
-            except pykube.exceptions.ObjectDoesNotExist:
-                pass
-
-    def create_zuul_launcher(self):
+        existing = utils.secret_informers.get(self.namespace).items()
+        for secret in existing.values():
+            labels = secret['metadata'].get('labels', {})
+            if (labels.get('app.kubernetes.io/instance') == self.name and
+                labels.get('app.kubernetes.io/component') ==
+                'nodepool-launcher'):
+                old_providers.add(labels.get(NODEPOOL_PROVIDER_LABEL))
+        if old_providers - new_providers:
+            self.delete_nodepool_launchers(keep=new_providers)
+
+    def _delete_unused(self, kind, selector, present):
+        # Delete every object of a kind matching the selector with one
+        # request, but only if there is any (present says whether
+        # there is).
+        if not present:
+            return
+        deleted = utils.delete_collection(
+            self.api, kind, self.namespace, selector)
+        for name in deleted:
+            self.log.info("Deleted unused %s %s", kind.kind, name)
+
+    def delete_nodepool_launchers(self, keep=()):
+        # Delete the deployments and secrets of every provider not in
+        # keep (so all of them if keep is empty; only do that when the
+        # launchers are no longer wanted at all).
+        selector = self.nodepool_labels()
+        if keep:
+            selector[f'{NODEPOOL_PROVIDER_LABEL}__notin'] = sorted(keep)
+        deployments = objects.Deployment.objects(self.api).filter(
+            namespace=self.namespace, selector=selector)
+        self._delete_unused(objects.Deployment, selector,
+                            any(True for d in deployments))
+        secrets = utils.secret_informers.get(self.namespace).items()
+        self._delete_unused(objects.Secret, selector, any(
+            self._nodepool_secret_unused(s, keep) for s in secrets.values()))
+
+    def _nodepool_secret_unused(self, secret, keep):
+        labels = secret['metadata'].get('labels') or {}
+        return (all(labels.get(k) == v
+                    for k, v in self.nodepool_labels().items()) and
+                labels.get(NODEPOOL_PROVIDER_LABEL) not in keep)
+
+    def delete_zuul_launcher(self):
+        selector = {'app.kubernetes.io/instance': self.name,
+                    'app.kubernetes.io/component': 'zuul-launcher',
+                    'app.kubernetes.io/name': 'zuul',
+                    'app.kubernetes.io/part-of': 'zuul'}
+        sets = objects.StatefulSet.objects(self.api).filter(
+            namespace=self.namespace, selector=selector)
+        self._delete_unused(objects.StatefulSet, selector,
+                            any(True for s in sets))
+
+    async def create_zuul_launcher(self):
         kw = {
-            'zuul_conf_sha': self.zuul_conf_sha,
+            'zuul_conf_shas': self.zuul_conf_shas,
             'instance_name': self.name,
             'connections': self.spec['connections'],
             'external_config': self.spec.get('externalConfig', {}),
             'spec': self.spec,
         }
-        utils.apply_file(self.api, 'zuul-launcher.yaml',
-                         namespace=self.namespace, **kw)
+        await utils.run_blocking(
+            utils.apply_file, self.api, 'zuul-launcher.yaml',
+            namespace=self.namespace, **kw)
+
+    def get_registry_secret(self):
+        # Reuse the previously generated secret so that the generated
+        # config (and therefore the registry) only changes when the
+        # user's config does.
+        try:
+            obj = utils.get_secret(self.api, self.namespace,
+                                   'zuul-registry-generated-config')
+            registry_yaml = yaml.safe_load(base64.b64decode(
+                obj.obj['data']['registry.yaml']))
+            secret = registry_yaml['registry'].get('secret')
+            if secret:
+                return secret
+        except pykube.exceptions.ObjectDoesNotExist:
+            pass
+        return utils.generate_password(56)
 
     def write_registry_conf(self):
         config_secret = self.spec['registry'].get('config', {}).\
@@ -391,9 +632,7 @@ class Zuul:
             raise kopf.PermanentError("No registry config secret found")
 
         try:
-            obj = objects.Secret.objects(self.api).\
-                filter(namespace=self.namespace).\
-                get(name=config_secret)
+            obj = utils.get_secret(self.api, self.namespace, config_secret)
         except pykube.exceptions.ObjectDoesNotExist:
             raise kopf.TemporaryError("Registry config secret not found")
 
@@ -409,7 +648,7 @@ class Zuul:
         reg['port'] = 9000
         reg['tls-cert'] = '/tls/tls.crt'
         reg['tls-key'] = '/tls/tls.key'
-        reg['secret'] = utils.generate_password(56)
+        reg['secret'] = self.get_registry_secret()
         reg['storage'] = {
             'driver': 'filesystem',
             'root': '/storage',
@@ -419,24 +658,42 @@ class Zuul:
         utils.update_secret(self.api, self.namespace,
                             'zuul-registry-generated-config',
                             string_data={'registry.yaml': text})
+        self.registry_conf_written = True
 
-    def create_registry(self):
-        self.write_registry_conf()
+    async def prepare_registry(self):
+        if self.spec['registry']['count']:
+            await utils.run_blocking(self.write_registry_conf)
+
+    async def create_registry(self):
+        if not self.registry_conf_written:
+            await utils.run_blocking(self.write_registry_conf)
         kw = {
             'instance_name': self.name,
             'spec': self.spec,
             'manage_registry_cert': self.manage_registry_cert,
         }
-        utils.apply_file(self.api, 'zuul-registry.yaml',
-                         namespace=self.namespace, **kw)
+        await utils.run_blocking(
+            utils.apply_file, self.api, 'zuul-registry.yaml',
+            namespace=self.namespace, **kw)
 
-    def create_zuul(self):
+    async def create_zuul(self):
         if self.spec['registry']['count']:
-            self.create_registry()
-
+            await self.create_registry()
+        await self.apply_zuul()
+        await self.create_launchers()
+
+    async def apply_zuul(self, components=None):
+        # Apply zuul.yaml, or only the objects in it belonging to the
+        # given components.  Objects which do not belong to any of the
+        # individually planned components (such as the ZooKeeper
+        # client certificate) are always applied; they are cheap when
+        # unchanged.
+        if self.zuul_conf_shas is None:
+            await utils.run_blocking(self.load_zuul_conf_shas)
         kw = {
-            'zuul_conf_sha': self.zuul_conf_sha,
+            'zuul_conf_shas': self.zuul_conf_shas,
             'zuul_tenant_secret': self.tenant_secret,
+            'push_tenant_config': self.push_tenant_config,
             'instance_name': self.name,
             'connections': self.spec['connections'],
             'executor_ssh_secret': self.spec['executor'].get(
@@ -446,84 +703,241 @@ class Zuul:
             'manage_db': self.manage_db,
             'auth': self.spec.get('auth', {}),
         }
-        utils.apply_file(self.api, 'zuul.yaml', namespace=self.namespace, **kw)
+        documents = await utils.run_blocking(
+            utils.load_file, 'zuul.yaml', namespace=self.namespace, **kw)
+        if components is not None:
+            skip = planner.COMPONENTS - set(components)
+            documents = [
+                d for d in documents
+                if d['metadata'].get('labels', {}).get(
+                    'app.kubernetes.io/component') not in skip]
+        await utils.run_blocking(
+            utils.apply_documents, self.api, documents)
+
+    def scale_workload(self, kind, name, replicas):
+        # Change only the replica count, through the scale
+        # subresource.  Returns False if there is no such workload.
+        obj = getattr(objects, kind)(self.api, {
+            'metadata': {'namespace': self.namespace, 'name': name}})
+        r = self.api.patch(**obj.api_kwargs(
+            subresource='scale',
+            headers={'Content-Type': 'application/merge-patch+json'},
+            params={'fieldManager': utils.FIELD_MANAGER},
+            data=json.dumps({'spec': {'replicas': replicas}})))
+        if r.status_code == 404:
+            return False
+        self.api.raise_for_status(r)
+        return True
+
+    async def scale(self, component, kind, name, path):
+        if (component == 'zuul-launcher' and
+            self.spec['launcher']['type'] not in ('zuul-launcher', 'both')):
+            return
+        section, key = path
+        replicas = self.spec[section][key]
+        self.log.info("Scaling %s %s to %s", kind, name, replicas)
+        if await utils.run_blocking(
+                self.scale_workload, kind, name, replicas):
+            return
+        # It doesn't exist yet, so create it from the template.
+        if component == 'zuul-launcher':
+            await self.create_launchers(nodepool=False)
+        else:
+            await self.apply_zuul({component})
+
+    async def create_launchers(self, nodepool=True, zuul_launcher=True):
+        # Create (or remove) the launchers of each type
         launcher_type = self.spec['launcher']['type']
-        if launcher_type in ('nodepool', 'both'):
-            self.create_nodepool()
-        if launcher_type in ('zuul-launcher', 'both'):
-            self.create_zuul_launcher()
-
-    def wait_for_statefulset(self, set_name, tries=6, delay=10):
-        self.log.info("Waiting for StatefulSet %s to finish rollout", set_name)
-        for _ in range(tries):
-            scheduler_set = objects.StatefulSet.objects(self.api).filter(
+        if nodepool:
+            if launcher_type in ('nodepool', 'both'):
+                await self.create_nodepool()
+            else:
+                await utils.run_blocking(self.delete_nodepool_launchers)
+        if zuul_launcher:
+            if launcher_type in ('zuul-launcher', 'both'):
+                if self.zuul_conf_shas is None:
+                    await utils.run_blocking(self.load_zuul_conf_shas)
+                await self.create_zuul_launcher()
+            else:
+                await utils.run_blocking(self.delete_zuul_launcher)
+
+    async def wait_for_statefulset(self, set_name, timeout=600):
+        def rolled_out(sets):
+            scheduler_set = sets.get(set_name)
+            if not scheduler_set:
+                return False
+            spec = scheduler_set['spec']
+            status = scheduler_set.get('status', {})
+            return (spec['replicas'] == status.get('replicas', None) and
+                    spec['replicas'] == status.get('currentReplicas', None) and
+                    spec['replicas'] == status.get('readyReplicas', None) and
+                    (status.get('updateRevision', None) ==
+                     status.get('currentRevision', None)))
+
+        def progress(sets):
+            status = sets.get(set_name, {}).get('status', {})
+            return (f"{status.get('readyReplicas', 0)} ready, "
+                    f"{status.get('updatedReplicas', 0)} updated")
+
+        try:
+            await utils.run_waiting(
+                waiter.wait_for,
+                self.api, objects.StatefulSet,
+                f"StatefulSet {set_name} to finish rollout", self.log,
+                condition=rolled_out, progress=progress, timeout=timeout,
+                metric_name='statefulset-rollout',
                 namespace=self.namespace,
                 selector={'app.kubernetes.io/instance': self.name,
                           'app.kubernetes.io/component': set_name,
                           'app.kubernetes.io/name': 'zuul',
-                          'app.kubernetes.io/part-of': 'zuul'}).get(
-                              name=set_name)
-            spec = scheduler_set.obj['spec']
-            status = scheduler_set.obj['status']
-            if (spec['replicas'] == status.get('replicas', None) and
-                spec['replicas'] == status.get('currentReplicas', None) and
-                spec['replicas'] == status.get('readyReplicas', None) and
-                (status.get('updateRevision', None) ==
-                 status.get('currentRevision', None))):
-                self.log.info("StatefulSet %s completed rollout", set_name)
-                return
-            time.sleep(delay)
-        self.log.error("StatefulSet did not finish rollout after %d seconds",
-                       tries * delay)
-
-    def smart_reconfigure(self):
+                          'app.kubernetes.io/part-of': 'zuul'},
+                field_selector={'metadata.name': set_name})
+        except waiter.WaitTimeout:
+            self.log.error("StatefulSet did not finish rollout after %d "
+                           "seconds", timeout)
+            return
+        self.log.info("StatefulSet %s completed rollout", set_name)
+
+    def update_status(self, status):
+        # Merge the given fields into the status of the Zuul resource
+        obj = objects.ZuulObject(self.api, {
+            'metadata': {'namespace': self.namespace, 'name': self.name}})
+        try:
+            obj.patch({'status': status})
+        except pykube.exceptions.HTTPError as e:
+            self.log.warning("Unable to update status: %s", e)
+
+    async def wait_for_tenant_config(self, pod_name, expected):
+        # Wait for the kubelet to update the mounted tenant config
+        delay = 10
+        retries = 30
+        timeout = delay * retries
+        command = [
+            '/usr/bin/timeout',
+            str(timeout),
+            '/bin/sh',
+            '-c',
+            f'while !( echo -n "{expected}" | sha256sum -c - );'
+            f'do sleep {delay}; done'
+        ]
+        resp = await utils.run_waiting(
+            utils.pod_exec, self.namespace, pod_name, command)
+        self.log.debug("Response: %s", resp)
+        return f'{self.tenant_config_path}: OK' in resp
+
+    async def push_tenant_config_to(self, pod_name, tenant_config,
+                                    expected):
+        # Write the tenant config into the scheduler ourselves.  It is
+        # written to a temporary file first and then renamed so that
+        # the scheduler never reads a partial file.
+        path = self.tenant_config_path
+        tmp_path = os.path.join(os.path.dirname(path), '.main.yaml.tmp')
+        command = [
+            '/bin/sh',
+            '-c',
+            f'head -c {len(tenant_config)} > {tmp_path} && '
+            f'mv {tmp_path} {path} && sha256sum {path}'
+        ]
+        resp = await utils.run_waiting(
+            utils.pod_exec, self.namespace, pod_name, command,
+            stdin=tenant_config)
+        self.log.debug("Response: %s", resp)
+        return expected in resp
+
+    async def reconfigure_pod(self, pod_name, tenant_config, expected):
+        with tracing.span('reconfigure_pod', **{'k8s.pod.name': pod_name}):
+            return await self._reconfigure_pod(
+                pod_name, tenant_config, expected)
+
+    async def _reconfigure_pod(self, pod_name, tenant_config, expected):
+        # Make sure the tenant config is up to date on one scheduler
+        # and then reconfigure it.  Returns the result for the status.
+        start = time.monotonic()
+        try:
+            if self.push_tenant_config:
+                self.log.info("Writing tenant config to %s", pod_name)
+                updated = await self.push_tenant_config_to(
+                    pod_name, tenant_config, expected)
+            else:
+                self.log.info("Waiting for config to update on %s",
+                              pod_name)
+                updated = await self.wait_for_tenant_config(
+                    pod_name, expected)
+
+            if updated:
+                self.log.info("Issuing smart-reconfigure on %s", pod_name)
+                command = [
+                    'zuul-scheduler',
+                    'smart-reconfigure',
+                ]
+                resp = await utils.run_waiting(
+                    utils.pod_exec, self.namespace, pod_name, command)
+                self.log.debug("Response: %s", resp)
+                result = 'reconfigured'
+            else:
+                self.log.error("Tenant config file never updated on %s",
+                               pod_name)
+                result = 'timeout'
+        except Exception as e:
+            self.log.exception("Error reconfiguring %s", pod_name)
+            result = f'error: {e}'
+        duration = time.monotonic() - start
+        # Without the details of any error
+        metrics.RECONFIGURE_DURATION.labels(
+            result.split(':')[0]).observe(duration)
+        return {
+            'result': result,
+            'duration': round(duration, 3),
+        }
+
+    async def smart_reconfigure(self):
         self.log.info("Smart reconfigure")
         try:
-            obj = objects.Secret.objects(self.api).\
-                filter(namespace=self.namespace).\
-                get(name=self.tenant_secret)
+            obj = await utils.run_blocking(
+                utils.get_secret, self.api, self.namespace,
+                self.tenant_secret)
             tenant_config = base64.b64decode(
                 obj.obj['data']['main.yaml'])
         except pykube.exceptions.ObjectDoesNotExist:
             self.log.error("Tenant config secret not found")
-            return
+            return None
 
         m = hashlib.sha256()
         m.update(tenant_config)
         conf_sha = m.hexdigest()
 
-        expected = f"{conf_sha}  /etc/zuul/tenant/main.yaml"
+        expected = f"{conf_sha}  {self.tenant_config_path}"
 
-        for obj in objects.Pod.objects(self.api).filter(
+        pods = await utils.run_blocking(
+            list, objects.Pod.objects(self.api).filter(
                 namespace=self.namespace,
                 selector={'app.kubernetes.io/instance': self.name,
                           'app.kubernetes.io/component': 'zuul-scheduler',
-                          'app.kubernetes.io/name': 'zuul'}):
-            self.log.info("Waiting for config to update on %s",
-                          obj.name)
-
-            delay = 10
-            retries = 30
-            timeout = delay * retries
-            command = [
-                '/usr/bin/timeout',
-                str(timeout),
-                '/bin/sh',
-                '-c',
-                f'while !( echo -n "{expected}" | sha256sum -c - );'
-                f'do sleep {delay}; done'
-            ]
-            resp = utils.pod_exec(self.namespace, obj.name, command)
-            self.log.debug("Response: %s", resp)
-
-            if '/etc/zuul/tenant/main.yaml: OK' in resp:
-                self.log.info("Issuing smart-reconfigure on %s", obj.name)
-                command = [
-                    'zuul-scheduler',
-                    'smart-reconfigure',
-                ]
-                resp = utils.pod_exec(self.namespace, obj.name, command)
-                self.log.debug("Response: %s", resp)
-            else:
-                self.log.error("Tenant config file never updated on %s",
-                               obj.name)
+                          'app.kubernetes.io/name': 'zuul'}))
+        # Every scheduler waits for the file (and is reconfigured)
+        # at the same time.
+        pod_names = sorted(obj.name for obj in pods)
+        results = await asyncio.gather(*[
+            self.reconfigure_pod(pod_name, tenant_config, expected)
+            for pod_name in pod_names])
+        for pod_name, result in zip(pod_names, results):
+            result['name'] = pod_name
+
+        failed = [result['name'] for result in results
+                  if result['result'] != 'reconfigured']
+        if failed:
+            self.log.error("Smart reconfigure failed on %s",
+                           ', '.join(failed))
+        else:
+            self.log.info("Smart reconfigure completed on %s pods",
+                          len(results))
+        status = {
+            'tenantConfigSha': conf_sha,
+            'time': datetime.datetime.now(
+                datetime.timezone.utc).isoformat(timespec='seconds'),
+            'success': not failed,
+            'pods': results,
+        }
+        await utils.run_blocking(
+            self.update_status, {'reconfigure': status})
+        return status